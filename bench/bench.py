@@ -0,0 +1,181 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import curses
+import json
+import os
+import platform
+import sys
+import time
+
+from bench import workloads
+from display.display import Display
+from display.display_curses import CursesDisplay
+from gameboy.emulator import Emulator
+
+
+def measure(fun, duration):
+    """
+    Call fun repeatedly for about duration seconds
+    :return: calls per second
+    """
+
+    count = 0
+    start = time.perf_counter()
+    while 1:
+        fun()
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= duration:
+            return count / elapsed
+
+
+def bench_cpu(rom, duration):
+    emulator = Emulator(rom)
+    emulator.step(2)
+    next_instruction = emulator.cpu.next_instruction
+
+    def batch():
+        for _ in range(1000):
+            next_instruction()
+
+    return measure(batch, duration) * 1000
+
+
+def bench_mmu(rom, duration):
+    emulator = Emulator(rom)
+    read, write = emulator.mmu.read, emulator.mmu.write
+    addrs = [0x0150, 0x4000, 0x8000, 0xC000, 0xFE00, 0xFF40, 0xFF80] * 16
+
+    def batch():
+        for addr in addrs:
+            write(addr, read(addr))
+
+    return measure(batch, duration) * len(addrs) * 2
+
+
+class FakeScreen:
+
+    def addstr(self, *args):
+        pass
+
+    def refresh(self):
+        pass
+
+
+def bench_draw(rom, duration):
+    emulator = Emulator(rom)
+    emulator.step(2)
+    return 1000 / measure(Display.draw.__get__(emulator.display), duration)
+
+
+def bench_render(rom, duration):
+    emulator = Emulator(rom)
+    emulator.step(2)
+
+    # curses display without terminal
+    display = CursesDisplay.__new__(CursesDisplay)
+    Display.__init__(display, emulator)
+    display.gameboy, display.overlay, display.scr = emulator, False, FakeScreen()
+    curses.LINES, curses.COLS = 145, 321
+
+    return 1000 / measure(lambda: display.render(emulator.display.screenbuffer), duration)
+
+
+def bench_frames(rom, duration):
+    emulator = Emulator(rom)
+    return measure(emulator.step, duration)
+
+
+benchmarks = {
+    'cpu': (bench_cpu, 'instructions/s', True),
+    'mmu': (bench_mmu, 'ops/s', True),
+    'draw': (bench_draw, 'ms/frame', False),
+    'render': (bench_render, 'ms/frame', False),
+    'frames': (bench_frames, 'frames/s', True),
+}
+
+
+def environment():
+    return {
+        'implementation': platform.python_implementation(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run(rom, names, duration):
+    """
+    :param rom: path to rom file or its content
+    """
+
+    results = {}
+    for name in names:
+        fun, unit, higher = benchmarks[name]
+        results[name] = {'value': fun(rom, duration), 'unit': unit, 'higher_is_better': higher}
+        print('{:8} {:14.2f} {}'.format(name, results[name]['value'], unit), file=sys.stderr)
+
+    return {'environment': environment(), 'results': results}
+
+
+def compare(baseline, current, threshold):
+    """
+    :return: names of benchmarks that got worse by more than threshold
+    """
+
+    regressions = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+
+        old, new = baseline['results'][name]['value'], result['value']
+        change = (new - old) / old if old else 0
+        worse = -change if result['higher_is_better'] else change
+
+        if worse > threshold:
+            regressions.append(name)
+
+        print('{:8} {:14.2f} {:14.2f} {:+8.1%} {}'.format(name, old, new, change,
+                                                           'REGRESSION' if worse > threshold else ''))
+
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy benchmarks')
+    parser.add_argument('--rom', dest='rom', default=None, type=str,
+                        help='ROM to benchmark with instead of a workload')
+    parser.add_argument('--workload', dest='workload', default='alu', choices=list(workloads.WORKLOADS),
+                        help='Synthetic workload ROM to benchmark with')
+    parser.add_argument('--only', dest='only', default=list(benchmarks), nargs='+', choices=list(benchmarks),
+                        help='Benchmarks to run')
+    parser.add_argument('--time', dest='time', default=2.0, type=float,
+                        help='Seconds per benchmark')
+    parser.add_argument('--output', dest='output', default=None, type=str,
+                        help='Write JSON report to file instead of stdout')
+    parser.add_argument('--compare', dest='compare', default=None, nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two JSON reports instead of running benchmarks')
+    parser.add_argument('--threshold', dest='threshold', default=0.05, type=float,
+                        help='Relative change that counts as regression')
+
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as file:
+                reports.append(json.load(file))
+
+        sys.exit(1 if compare(*reports, args.threshold) else 0)
+
+    report = run(args.rom or workloads.build(args.workload), args.only, args.time)
+    report['environment']['rom'] = args.rom or args.workload
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,138 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+from bench import testroms
+from gameboy.emulator import Emulator
+from instructions.assembler import cartridge
+
+"""
+Runs test ROMs headless and detects their result:
+  serial    the text sent through the serial port contains "Passed" or "Failed", as Blargg's test ROMs and the
+            built-in test ROMs (bench.testroms) report
+  memory    signature DE B0 61 at A001, result code at A000 (0x80 while running, 0 passed) and text from A004 on
+A ROM that doesn't report a result within the cycle budget times out, it's hanging or too slow.
+
+Tests are given as .gb ROMs, .asm sources for the built-in assembler or names of built-in test ROMs.
+"""
+
+# result checked every number of frames
+CHECK = 10
+
+
+def load(test):
+    """
+    :return: cartridge image of a test
+    """
+
+    if test in testroms.TESTROMS:
+        return testroms.build(test)
+
+    if test.endswith('.asm'):
+        with open(test) as file:
+            return cartridge(file.read(), os.path.basename(test)[:-4].upper())
+
+    with open(test, 'rb') as file:
+        return file.read()
+
+
+def result(emulator):
+    """
+    :return: status passed or failed and the reported text, None while running
+    """
+
+    text = emulator.serial_output().decode('ascii', 'replace')
+    if 'Passed' in text:
+        return 'passed', text
+    if 'Failed' in text:
+        return 'failed', text
+
+    ram = emulator.mmu.ram
+    if ram[0xA001:0xA004] == b'\xDE\xB0\x61' and ram[0xA000] != 0x80:
+        end = ram.find(0, 0xA004)
+        text = bytes(ram[0xA004:end if end >= 0 else 0xC000]).decode('ascii', 'replace')
+        return 'passed' if ram[0xA000] == 0 else 'failed', text
+
+    return None
+
+
+def run_test(test, budget=1 << 29):
+    """
+    :param budget: cycles to emulate at most
+    :return: result of one test as dict
+    """
+
+    start = time.perf_counter()
+    status, text, cycles = 'timeout', '', 0
+
+    try:
+        emulator = Emulator(load(test))
+        while emulator.cpu.cycles < budget:
+            emulator.step(CHECK)
+            reported = result(emulator)
+            if reported:
+                status, text = reported
+                break
+        else:
+            text = emulator.serial_output().decode('ascii', 'replace')
+        cycles = emulator.cpu.cycles
+    except Exception as error:
+        status, text = 'error', '{}: {}'.format(type(error).__name__, error)
+
+    return {'test': test, 'status': status, 'text': text, 'cycles': cycles, 'seconds': time.perf_counter() - start}
+
+
+def find(paths):
+    """
+    :return: tests of the given files, directories and built-in names
+    """
+
+    tests = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                tests += sorted(os.path.join(root, name) for name in files if name.endswith(('.gb', '.gbc', '.asm')))
+        else:
+            tests.append(path)
+    return tests
+
+
+def run(tests, budget=1 << 29, jobs=None):
+    """
+    Run tests in parallel
+    :return: results in order of the tests
+    """
+
+    with multiprocessing.Pool(jobs) as pool:
+        return pool.starmap(run_test, [(test, budget) for test in tests], chunksize=1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - run test ROMs')
+    parser.add_argument('tests', type=str, nargs='*',
+                        help='Test ROMs, assembly sources, directories or built-in test ROMs, all built-in ones by '
+                             'default')
+    parser.add_argument('--budget', dest='budget', default=1 << 29, type=int,
+                        help='Cycles after which a test times out, 4194304 per second')
+    parser.add_argument('--jobs', dest='jobs', default=None, type=int, help='Parallel processes, all CPUs by default')
+    parser.add_argument('--verbose', dest='verbose', default=False, action='store_true',
+                        help='Show the text reported by each test')
+
+    args = parser.parse_args()
+
+    results = run(find(args.tests) or list(testroms.TESTROMS), args.budget, args.jobs)
+
+    for entry in results:
+        print('{:8} {:40} {:12} cycles {:8.1f}s'.format(entry['status'].upper(), entry['test'][-40:],
+                                                         entry['cycles'], entry['seconds']))
+        if args.verbose or entry['status'] != 'passed':
+            for line in entry['text'].strip().splitlines():
+                print('         ' + line)
+
+    passed = sum(entry['status'] == 'passed' for entry in results)
+    print('{} of {} passed'.format(passed, len(results)))
+    sys.exit(0 if passed == len(results) else 1)
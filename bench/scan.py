@@ -0,0 +1,177 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+
+from gameboy.emulator import Emulator
+
+"""
+Compatibility scan, runs every ROM of a directory headless for a number of frames and classifies how it ends:
+  ok        all frames emulated
+  opcode    unmapped opcode, KeyError from Instructions.decode
+  mbc       exception in the memory bank controller, e.g. unsupported cartridge or bank out of range
+  stuck     machine state unchanged for a number of frames with interrupts disabled and the CPU is running in a loop
+            of a few bytes
+  error     any other exception
+"""
+
+EXTENSIONS = ('.gb', '.gbc')
+
+# size in bytes of a loop the CPU is considered hanging in
+LOOP = 16
+
+
+def loop(emulator, instructions=256):
+    """
+    Run some instructions and restore the state afterwards
+    :return: size of the address range they were executed in
+    """
+
+    cpu, ram = emulator.cpu, emulator.mmu.ram
+    state = emulator.save_state()
+    pcs = []
+    for _ in range(instructions):
+        pcs.append(cpu.PC)
+        # as in CPU.next_instructions, a halted CPU waits for an interrupt request
+        if cpu.halted:
+            if not ram[0xFFFF] & ram[0xFF0F] & 0x1F:
+                break
+            cpu.halted = False
+        cpu.next_instruction()
+    emulator.load_state(state)
+
+    return max(pcs) - min(pcs)
+
+
+def classify(error):
+    """
+    :return: status and detail of an exception raised while emulating
+    """
+
+    frames = traceback.extract_tb(error.__traceback__)
+    where = frames[-1] if frames else None
+
+    if isinstance(error, KeyError) and where and where.name == 'decode':
+        return 'opcode', 'unmapped opcode {:02X}'.format(error.args[0])
+    if any(frame.filename.endswith(os.path.join('gameboy', 'mbc.py')) for frame in frames):
+        return 'mbc', '{}: {}'.format(type(error).__name__, error)
+    return 'error', '{}: {} at {}:{}'.format(type(error).__name__, error, where.filename if where else '?',
+                                             where.lineno if where else '?')
+
+
+def scan(path, frames=600, stuck=120):
+    """
+    :param frames: frames to emulate
+    :param stuck: frames with unchanged state after which the ROM counts as stuck
+    :return: result of one ROM as dict
+    """
+
+    result = {'rom': path, 'title': None, 'type': None, 'status': 'ok', 'detail': '', 'frames': 0, 'fps': 0.0,
+              'hash': None}
+    emulator = None
+    start = time.perf_counter()
+
+    try:
+        emulator = Emulator(path)
+        mbc = emulator.mmu.mbc
+        result['title'], result['type'] = mbc.title.rstrip('\0'), mbc.type
+
+        previous, unchanged = None, 0
+        for frame in range(frames):
+            emulator.step()
+            result['frames'] = frame + 1
+
+            cpu, ram = emulator.cpu, emulator.mmu.ram
+            if cpu.ime and ram[0xFFFF] & 0x1F:
+                unchanged = 0
+                continue
+
+            current = emulator.save_state()
+            unchanged = unchanged + 1 if current == previous else 0
+            previous = current
+
+            if unchanged >= stuck:
+                if loop(emulator) < LOOP:
+                    result['status'], result['detail'] = 'stuck', 'stuck at PC {:04X}'.format(cpu.PC)
+                    break
+                unchanged = 0
+
+    except Exception as error:
+        result['status'], result['detail'] = classify(error)
+
+    elapsed = time.perf_counter() - start
+    result['fps'] = result['frames'] / elapsed if elapsed else 0.0
+    if emulator:
+        result['hash'] = hashlib.sha1(emulator.get_frame()).hexdigest()
+
+    return result
+
+
+def find(directory):
+    """
+    :return: paths of all ROMs below the directory
+    """
+
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths += [os.path.join(root, name) for name in files if name.lower().endswith(EXTENSIONS)]
+    return sorted(paths)
+
+
+def run(paths, frames=600, stuck=120, jobs=None):
+    """
+    Scan ROMs in parallel
+    :return: results in order of the paths
+    """
+
+    with multiprocessing.Pool(jobs) as pool:
+        results = pool.starmap(scan, [(path, frames, stuck) for path in paths], chunksize=1)
+    return results
+
+
+def report(results):
+    """
+    :return: results as text table and summary
+    """
+
+    lines = ['{:40} {:16} {:>4} {:8} {:>7} {:12} {}'.format('rom', 'title', 'type', 'status', 'fps', 'hash',
+                                                            'detail')]
+    for result in results:
+        lines.append('{:40} {:16} {:>4} {:8} {:7.1f} {:12} {}'.format(
+            os.path.basename(result['rom'])[:40], (result['title'] or '')[:16],
+            '' if result['type'] is None else '{:02X}'.format(result['type']), result['status'], result['fps'],
+            (result['hash'] or '')[:12], result['detail']))
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    lines += ['', ', '.join('{} {}'.format(count, status) for status, count in sorted(counts.items()))]
+
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - scan a directory of ROMs for compatibility and speed')
+    parser.add_argument('directory', type=str, help='Directory with ROMs, searched recursively')
+    parser.add_argument('--frames', dest='frames', default=600, type=int, help='Frames to emulate per ROM')
+    parser.add_argument('--stuck', dest='stuck', default=120, type=int,
+                        help='Frames with unchanged state and interrupts disabled after which a ROM counts as stuck')
+    parser.add_argument('--jobs', dest='jobs', default=None, type=int, help='Parallel processes, all CPUs by default')
+    parser.add_argument('--output', dest='output', default=None, type=str, help='Write the results as JSON file')
+
+    args = parser.parse_args()
+
+    results = run(find(args.directory), args.frames, args.stuck, args.jobs)
+    print(report(results))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=1)
+
+    sys.exit(0 if all(result['status'] == 'ok' for result in results) else 1)
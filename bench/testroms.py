@@ -0,0 +1,124 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import os
+
+from bench.workloads import PRELUDE
+from instructions.assembler import cartridge
+
+"""
+Test ROMs assembled by the built-in assembler. Like Blargg's test ROMs they report through the serial port, the
+name of each failing check followed by "Failed", or "Passed" at the end.
+"""
+
+# prints the zero terminated string at HL through the serial port
+PRINT = """
+print:
+    LD A,(HL+)
+    OR A
+    RET Z
+    LDH ($01),A
+    LD A,$81
+    LDH ($02),A
+print_wait:
+    LDH A,($02)
+    BIT 7,A
+    JR NZ,print_wait
+    JR print
+"""
+
+# name -> setup, expected A and F
+ALU = [
+    ('ADD A,d8', 'LD A,$0F\n    ADD A,$01', 0x10, 0x20),
+    ('ADD A,d8 carry', 'LD A,$FF\n    ADD A,$01', 0x00, 0xB0),
+    ('SUB d8', 'LD A,$00\n    SUB $01', 0xFF, 0x70),
+    ('ADC A,d8', 'LD A,$E1\n    SCF\n    ADC A,$0F', 0xF1, 0x20),
+    ('SBC A,d8', 'LD A,$3B\n    SCF\n    SBC A,$2A', 0x10, 0x40),
+    ('CP d8', 'LD A,$3C\n    CP $2F', 0x3C, 0x60),
+    ('INC A', 'LD A,$0F\n    AND A\n    INC A', 0x10, 0x20),
+    ('DEC A', 'LD A,$01\n    AND A\n    DEC A', 0x00, 0xC0),
+    ('DAA', 'LD A,$45\n    ADD A,$38\n    DAA', 0x83, 0x00),
+    ('SCF CCF', 'XOR A\n    SCF\n    CCF', 0x00, 0x80),
+    ('RLCA', 'LD A,$80\n    RLCA', 0x01, 0x10),
+    ('RRA', 'LD A,$01\n    AND A\n    RRA', 0x00, 0x10),
+    ('SWAP A', 'LD A,$F0\n    SWAP A', 0x0F, 0x00),
+    ('SRA A', 'LD A,$80\n    SRA A', 0xC0, 0x00),
+    ('SLA A', 'LD A,$81\n    SLA A', 0x02, 0x10),
+    ('BIT 7,A', 'LD A,$7F\n    AND A\n    BIT 7,A', 0x7F, 0xA0),
+    ('ADD HL,BC', 'XOR A\n    LD HL,$8A23\n    LD BC,$0605\n    ADD HL,BC\n    LD A,H', 0x90, 0xA0),
+    ('POP AF', 'LD BC,$12FF\n    PUSH BC\n    POP AF', 0x12, 0xF0),
+]
+
+
+def checks(tests):
+    """
+    :return: source running the tests, each one jumps to its failure message if A or F differ
+    """
+
+    code, messages = '', ''
+    for i, (name, setup, a, f) in enumerate(tests):
+        code += """
+    {setup}
+    PUSH AF
+    POP BC
+    LD A,B
+    CP ${a:02X}
+    JP NZ,fail_{i}
+    LD A,C
+    CP ${f:02X}
+    JP NZ,fail_{i}
+""".format(setup=setup, a=a, f=f, i=i)
+        messages += """
+fail_{i}:
+    LD HL,message_{i}
+    JP failed
+message_{i}:
+    DB "{name}",10,0
+""".format(i=i, name=name)
+
+    return code + """
+    LD HL,passed
+    CALL print
+    JP done
+failed:
+    CALL print
+    LD HL,failed_text
+    CALL print
+done:
+    JR done
+passed:
+    DB "Passed",10,0
+failed_text:
+    DB "Failed",10,0
+""" + messages
+
+
+def source(tests):
+    return PRELUDE + checks(tests) + PRINT + """
+vblank:
+    RETI
+"""
+
+
+TESTROMS = {
+    'alu': ALU,
+}
+
+
+def build(name):
+    """
+    :return: cartridge image of a test ROM
+    """
+    return cartridge(source(TESTROMS[name]), name.upper())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - write test ROMs')
+    parser.add_argument('directory', type=str, help='Output directory')
+
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for name in TESTROMS:
+        with open(os.path.join(args.directory, name + '.gb'), 'wb') as file:
+            file.write(build(name))
@@ -0,0 +1,282 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import hashlib
+import os
+
+from gameboy.emulator import Emulator
+from instructions.assembler import cartridge
+
+"""
+Synthetic workload ROMs for benchmarks and tests, each stressing one part of the emulator
+"""
+
+# entry point, the emulator starts at 0x0000 without boot ROM
+PRELUDE = """
+    ORG $0000
+    JP start
+
+    ORG $0040
+    JP vblank
+
+    ORG $0150
+start:
+    DI
+    LD SP,$FFFE
+    LD A,$91
+    LDH ($40),A
+    LD A,$E4
+    LDH ($47),A
+    LDH ($48),A
+
+    ; cartridge title as tile 1 across the top row, each workload draws a different frame
+    LD HL,$0134
+    LD DE,$8010
+    LD B,16
+prelude_tile:
+    LD A,(HL+)
+    LD (DE),A
+    INC DE
+    DEC B
+    JR NZ,prelude_tile
+    LD HL,$9800
+    LD A,1
+    LD B,20
+prelude_map:
+    LD (HL+),A
+    DEC B
+    JR NZ,prelude_map
+"""
+
+# arithmetic, logic, rotate and bit instructions on registers only
+ALU = PRELUDE + """
+    LD BC,$1234
+    LD DE,$5678
+    LD HL,$9ABC
+loop:
+    ADD A,B
+    ADC A,C
+    SUB D
+    SBC A,E
+    AND $F7
+    XOR B
+    OR C
+    CP D
+    INC A
+    DEC B
+    INC C
+    DEC D
+    SWAP A
+    RLCA
+    RRA
+    SLA E
+    SRL D
+    RL C
+    RR B
+    ADD HL,DE
+    INC HL
+    DEC BC
+    PUSH AF
+    POP AF
+    BIT 3,A
+    SET 1,B
+    RES 2,C
+    DAA
+    CPL
+    CCF
+    SCF
+    JP loop
+vblank:
+    RETI
+"""
+
+# copy and fill loops as used by games to set up memory
+MEMCPY = PRELUDE + """
+loop:
+    LD HL,$0000
+    LD DE,$C000
+    LD BC,$1000
+copy:
+    LD A,(HL+)
+    LD (DE),A
+    INC DE
+    DEC BC
+    LD A,B
+    OR C
+    JR NZ,copy
+
+    LD HL,$D000
+    LD DE,$8000
+    LD B,0
+copy8:
+    LD A,(HL+)
+    LD (DE),A
+    INC DE
+    DEC B
+    JR NZ,copy8
+
+    LD HL,$D000
+    LD A,$55
+    LD B,0
+fill:
+    LD (HL+),A
+    DEC B
+    JR NZ,fill
+
+    LD HL,$DFFF
+    LD A,$AA
+    LD C,$10
+    LD B,0
+clear:
+    LD (HL-),A
+    DEC B
+    JR NZ,clear
+    DEC C
+    JR NZ,clear
+    JP loop
+vblank:
+    RETI
+"""
+
+# switches ROM banks all the time and calls code in each of them
+BANKS = PRELUDE + """
+loop:
+    LD A,1
+    LD ($2000),A
+    CALL $4000
+    LD A,2
+    LD ($2000),A
+    CALL $4000
+    LD A,3
+    LD ($2000),A
+    CALL $4000
+    LD A,($4100)
+    LD ($C001),A
+    JP loop
+vblank:
+    RETI
+""" + "".join("""
+    BANK {0}
+    LD HL,$4100
+    LD A,(HL+)
+    ADD A,(HL)
+    LD ($C000),A
+    RET
+    ORG $4100
+    DB {0},{0}
+""".format(bank) for bank in range(1, 4))
+
+# updates tile data, tile map, scroll registers and sprites through OAM DMA all the time
+VRAM = PRELUDE + """
+    LD E,0
+loop:
+    LD HL,$8000
+    LD BC,$1000
+tiles:
+    LD A,L
+    ADD A,E
+    LD (HL+),A
+    DEC BC
+    LD A,B
+    OR C
+    JR NZ,tiles
+
+    LD HL,$9800
+    LD BC,$0400
+map:
+    LD A,L
+    XOR E
+    LD (HL+),A
+    DEC BC
+    LD A,B
+    OR C
+    JR NZ,map
+
+    LD HL,$C100
+    LD B,160
+sprites:
+    LD A,L
+    ADD A,E
+    LD (HL+),A
+    DEC B
+    JR NZ,sprites
+    LD A,$C1
+    LDH ($46),A
+
+    LD A,E
+    LDH ($42),A
+    LDH ($43),A
+    INC E
+    JP loop
+vblank:
+    RETI
+"""
+
+# waits for V-Blank with HALT, all work is done in the interrupt handler
+HALT = PRELUDE + """
+    LD A,$01
+    LDH ($FF),A
+    EI
+loop:
+    HALT
+    JR loop
+vblank:
+    PUSH AF
+    PUSH HL
+    LDH A,($43)
+    INC A
+    LDH ($43),A
+    LD HL,$C000
+    INC (HL)
+    POP HL
+    POP AF
+    RETI
+"""
+
+# name -> source, cartridge type, ROM banks
+WORKLOADS = {
+    'alu': (ALU, 0, 2),
+    'memcpy': (MEMCPY, 0, 2),
+    'banks': (BANKS, 1, 4),
+    'vram': (VRAM, 0, 2),
+    'halt': (HALT, 0, 2),
+}
+
+
+def build(name):
+    """
+    :return: cartridge image of a workload
+    """
+
+    source, cartridge_type, banks = WORKLOADS[name]
+    return cartridge(source, name.upper(), cartridge_type, banks)
+
+
+def frame_hashes(frames=30):
+    """
+    :return: workload -> hash of the frame drawn after some frames
+    """
+
+    hashes = {}
+    for name in WORKLOADS:
+        emulator = Emulator(build(name))
+        emulator.step(frames)
+        hashes[name] = hashlib.sha1(emulator.get_frame()).hexdigest()
+    return hashes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - write workload ROMs')
+    parser.add_argument('directory', type=str, help='Output directory')
+
+    args = parser.parse_args()
+
+    os.makedirs(args.directory, exist_ok=True)
+    for name in WORKLOADS:
+        with open(os.path.join(args.directory, name + '.gb'), 'wb') as file:
+            file.write(build(name))
+
+    # the frames are checked by the draw and render benchmarks, each workload has to show something of its own
+    hashes = frame_hashes()
+    if len(set(hashes.values())) != len(hashes):
+        raise RuntimeError('workloads draw the same frame: {}'.format(hashes))
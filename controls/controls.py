@@ -4,10 +4,40 @@ RIGHT, LEFT, UP, DOWN, A, B, SELECT, START = range(8)
 
 
 class Controls:
+    # button states latched for the current frame, bit cleared while pressed
     states = 0xFF
+    # button states as currently pressed
+    keys = 0xFF
+
+    turbo = False
+    rewinding = False
+    done = False
+
+    # movie the latched states get recorded to
+    recorder = None
 
     def on_press(self, key):
-        self.states &= ~(1 << key)
+        self.keys &= ~(1 << key)
 
     def on_release(self, key):
-        self.states |= (1 << key)
+        self.keys |= (1 << key)
+
+    def poll(self):
+        """
+        Update the pressed buttons from a backend without input thread, called once per frame
+        """
+        pass
+
+    def latch(self):
+        """
+        Take over the pressed buttons at the start of a frame, so input doesn't change within a frame
+        """
+
+        self.poll()
+        self.states = self.keys
+
+        if self.recorder:
+            self.recorder.write(self.states)
+
+    def toggle_turbo(self):
+        self.turbo = not self.turbo
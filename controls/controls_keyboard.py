@@ -32,9 +32,15 @@ class KeyboardControls(Controls):
             listener.join()
 
     def on_press(self, key):
-        if key in mapping:
+        if key == Key.tab:
+            self.toggle_turbo()
+        elif key == KeyCode.from_char('r'):
+            self.rewinding = True
+        elif key in mapping:
             super().on_press(mapping[key])
 
     def on_release(self, key):
-        if key in mapping:
+        if key == KeyCode.from_char('r'):
+            self.rewinding = False
+        elif key in mapping:
             super().on_release(mapping[key])
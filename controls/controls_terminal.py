@@ -0,0 +1,135 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import atexit
+import os
+import select
+import sys
+import termios
+import tty
+
+from controls.controls import *
+
+# not buttons, handled by the controls themselves
+TURBO, REWIND = 8, 9
+
+mapping = {
+    b'\x1b[B': DOWN,
+    b'\x1b[A': UP,
+    b'\x1b[D': LEFT,
+    b'\x1b[C': RIGHT,
+    # cursor keys in application mode
+    b'\x1bOB': DOWN,
+    b'\x1bOA': UP,
+    b'\x1bOD': LEFT,
+    b'\x1bOC': RIGHT,
+    b'\r': START,
+    b'\n': START,
+    b'\x7f': SELECT,
+    b'\x08': SELECT,
+    b's': B,
+    b'a': A,
+    b'\t': TURBO,
+    b'r': REWIND,
+}
+
+
+class TerminalControls(Controls):
+    """
+    Reads the terminal without blocking once per frame, there is no input thread and no display server needed.
+    Terminals only report key presses, a button counts as released when its key wasn't repeated for hold frames.
+    """
+
+    def __init__(self, hold=8, fd=None):
+        """
+        :param hold: frames a button stays pressed after the last key press or repeat
+        :param fd: file descriptor to read, stdin by default
+        """
+
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self.hold = hold
+        # button -> frames left until it's released
+        self.held = {}
+        # incomplete escape sequence of the last read
+        self.pending = b''
+
+        self.attributes = None
+        if os.isatty(self.fd):
+            self.attributes = termios.tcgetattr(self.fd)
+            tty.setcbreak(self.fd)
+            atexit.register(self.close)
+
+    def close(self):
+        """
+        Restore the terminal settings
+        """
+
+        if self.attributes:
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.attributes)
+            self.attributes = None
+
+    def suspend(self):
+        """
+        Give the terminal back to line input, e.g. for the debugger prompt
+        """
+
+        if self.attributes:
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.attributes)
+
+    def resume(self):
+        if self.attributes:
+            tty.setcbreak(self.fd)
+
+    def read(self):
+        """
+        :return: all bytes available without blocking
+        """
+
+        data = self.pending
+        while select.select([self.fd], [], [], 0)[0]:
+            chunk = os.read(self.fd, 1024)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def parse(self, data):
+        """
+        :return: keys in data, incomplete escape sequence at the end
+        """
+
+        keys = []
+        i = 0
+        while i < len(data):
+            for sequence, key in mapping.items():
+                if data.startswith(sequence, i):
+                    keys.append(key)
+                    i += len(sequence)
+                    break
+            else:
+                rest = data[i:]
+                if rest.startswith(b'\x1b') and len(rest) < 3:
+                    return keys, rest
+                # unmapped key or sequence, skip it
+                i += 1
+
+        return keys, b''
+
+    def poll(self):
+        for key in list(self.held):
+            self.held[key] -= 1
+            if not self.held[key]:
+                del self.held[key]
+                if key < TURBO:
+                    self.on_release(key)
+
+        keys, self.pending = self.parse(self.read())
+        for key in keys:
+            if key == TURBO:
+                self.toggle_turbo()
+                continue
+
+            if key < TURBO and key not in self.held:
+                self.on_press(key)
+            self.held[key] = self.hold
+
+        self.rewinding = REWIND in self.held
@@ -0,0 +1,66 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import hashlib
+import struct
+
+from controls.controls import Controls
+
+"""
+Movie file format
+  'CYBM'  magic
+  u16     format version
+  20B     SHA-1 of the ROM
+  1B      latched button states for each frame
+"""
+
+MAGIC = b'CYBM'
+VERSION = 1
+HEADER = struct.Struct('<4sH20s')
+
+
+def rom_hash(rom):
+    return hashlib.sha1(rom).digest()
+
+
+class MovieRecorder:
+
+    def __init__(self, path, rom):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, rom_hash(rom)))
+
+    def write(self, states):
+        self.file.write(bytes((states,)))
+
+    def close(self):
+        self.file.close()
+
+
+class ReplayControls(Controls):
+    """
+    Feeds the button states of a movie, frame by frame, instead of keyboard input
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        magic, version, self.hash = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a supported movie file'.format(path))
+
+        self.movie = data[HEADER.size:]
+        self.frame = 0
+
+    def verify(self, rom):
+        if rom_hash(rom) != self.hash:
+            raise ValueError('movie was recorded with a different ROM')
+
+    def latch(self):
+        if self.frame < len(self.movie):
+            self.keys = self.movie[self.frame]
+            self.frame += 1
+        else:
+            self.keys = 0xFF
+            self.done = True
+
+        super().latch()
@@ -1,36 +1,220 @@
 #  SPDX-License-Identifier: GPL-3.0-only
 
 import argparse
+import atexit
+import signal
 
-from controls.controls_keyboard import KeyboardControls
-from display.display_curses import CursesDisplay
+from gameboy import state
 from gameboy.cpu import CPU
+from gameboy.frameskip import FrameSkip
 from gameboy.mmu import MMU
+from gameboy.pacer import Pacer
+from gameboy.serial import Serial, connect
+
+
+def frameskip(value):
+    return value if value == 'auto' else int(value)
+
+
+def speed(value):
+    value = float(value)
+    if value <= 0:
+        raise argparse.ArgumentTypeError('must be greater than 0')
+    return value
+
+
+def address(value):
+    return int(value.lstrip('$'), 16) & 0xFFFF
 
 
 class CyBoy:
 
     def __init__(self, args):
-        self.controls = KeyboardControls()
-        self.mmu = MMU(self, args)
-        self.display = CursesDisplay(self, args.overlay)
+        # backends and tools are only imported when selected, pynput and curses are slow to load and pynput starts a
+        # listener thread
+        if args.play_movie:
+            from controls.movie import ReplayControls
+            self.controls = ReplayControls(args.play_movie)
+        elif args.controls == 'terminal':
+            from controls.controls_terminal import TerminalControls
+            self.controls = TerminalControls(args.key_hold)
+        elif args.controls == 'keyboard':
+            from controls.controls_keyboard import KeyboardControls
+            self.controls = KeyboardControls()
+        else:
+            from controls.controls import Controls
+            self.controls = Controls()
+        self.controls.turbo = args.turbo
+
+        self.mmu = MMU(self, args.rom)
+
+        if args.link or args.serial_output:
+            self.mmu.serial = Serial(self, connect(args.link) if args.link else None, args.serial_output)
+
+        if args.play_movie:
+            self.controls.verify(self.mmu.mbc.rom)
+        if args.record_movie:
+            from controls.movie import MovieRecorder
+            self.controls.recorder = MovieRecorder(args.record_movie, self.mmu.mbc.rom)
+            atexit.register(self.controls.recorder.close)
+
+        if args.renderer:
+            from display.display_shared import SharedDisplay
+            self.display = SharedDisplay(self, args.display, output=args.output, format=args.format,
+                                         overlay=args.overlay)
+        elif args.display == 'raw':
+            from display.display_raw import RawDisplay
+            self.display = RawDisplay(self, args.output, args.format)
+        else:
+            from display.display_curses import CursesDisplay
+            self.display = CursesDisplay(self, args.overlay)
+        self.pacer = Pacer(self.controls, args.speed)
+        self.frameskip = FrameSkip(self.pacer, args.frameskip)
         self.cpu = CPU(self)
 
+        if args.engine == 'fast':
+            from gameboy.fast import FastEngine
+            FastEngine(self.cpu).install()
+        elif args.engine == 'idioms':
+            from gameboy.idioms import IdiomEngine
+            IdiomEngine(self.cpu).install()
+        self.apu = None
+        if args.audio:
+            from gameboy.apu import APU
+            self.apu = self.mmu.apu = APU(self, args.audio, args.audio_format, args.audio_rate)
+
+        self.rewind = None
+        if args.rewind:
+            from gameboy.rewind import Rewind
+            self.rewind = Rewind(self, args.rewind, args.rewind_memory << 20)
+
+        if args.profile:
+            from gameboy.profiler import Profiler
+            self.profiler = Profiler(self.cpu)
+            self.profiler.install()
+            atexit.register(self.profiler.dump, args.profile)
+
+        self.tracer, self.trace = None, args.trace
+        if args.trace:
+            from gameboy.trace import Tracer
+            # written on crash or when receiving SIGUSR1
+            self.tracer = Tracer(self.cpu, args.trace_size)
+            self.tracer.install()
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.tracer.dump(self.trace))
+
+        if args.debug or args.breakpoints:
+            from gameboy.debugger import Debugger
+            self.debugger = Debugger(self)
+            for addr in args.breakpoints or []:
+                self.debugger.add_breakpoint(addr)
+            if args.debug:
+                self.debugger.step()
+                # ctrl-c stops at the next instruction
+                signal.signal(signal.SIGINT, lambda signum, frame: self.debugger.step())
+
+    def save_state(self):
+        """
+        Snapshot of the whole machine, only in between frames
+        :return: state as bytes
+        """
+        return state.save(self)
+
+    def load_state(self, data):
+        state.load(self, data)
+
     def start(self):
         self.cpu.instructions.build(self)
 
+        try:
+            self.run()
+        except Exception:
+            if self.tracer:
+                self.tracer.dump(self.trace)
+            raise
+
+    def run(self):
         # main-loop
-        while 1:
-            self.cpu.next_frame()
+        while not self.controls.done:
+            if self.rewind and self.controls.rewinding:
+                # no frame is run, which would poll the controls
+                self.controls.poll()
+                if self.rewind.rewind():
+                    self.display.draw()
+            else:
+                self.cpu.next_frame()
+                self.mmu.serial.sync()
+                if self.apu:
+                    self.apu.render()
+                if self.rewind:
+                    self.rewind.push()
+
+            self.pacer.wait()
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='CyBoy - An experimental gameboy emulator')
     parser.add_argument('rom', type=str, help='ROM file')
+    parser.add_argument('--controls', dest='controls', default='terminal', choices=['terminal', 'keyboard', 'none'],
+                        help='Controls backend, terminal reads keys once per frame, keyboard listens to the keyboard '
+                             'through pynput, none for headless use without input')
+    parser.add_argument('--key-hold', dest='key_hold', default=8, type=int,
+                        help='Frames a button stays pressed after a key press in the terminal')
+    parser.add_argument('--display', dest='display', default='curses', choices=['curses', 'raw'],
+                        help='Display backend, raw writes video frames to --output')
+    parser.add_argument('--output', dest='output', default='-', type=str,
+                        help='Output file of the raw display, - for stdout')
+    parser.add_argument('--format', dest='format', default='y4m', choices=['y4m', 'ppm'],
+                        help='Video format of the raw display')
+    parser.add_argument('--renderer', dest='renderer', default=False, action='store_true',
+                        help='Run the display backend in a separate renderer process')
     parser.add_argument('--overlay', dest='overlay', default=False, action='store_true',
-                        help='Show overlay with FPS')
+                        help='Show overlay with FPS and frame time jitter')
+    parser.add_argument('--audio', dest='audio', default=None, type=str,
+                        help='Emulate sound and write it to a file, - for stdout with --audio-format pcm and '
+                             '--display raw with an --output file')
+    parser.add_argument('--audio-format', dest='audio_format', default='wav', choices=['wav', 'pcm'],
+                        help='Audio format, pcm is signed 16 bit little endian stereo')
+    parser.add_argument('--audio-rate', dest='audio_rate', default=48000, type=int,
+                        help='Audio sample rate')
+    parser.add_argument('--link', dest='link', default=None, type=str,
+                        help='Link cable to another instance started with the same Unix socket path')
+    parser.add_argument('--serial-output', dest='serial_output', default=None, type=str,
+                        help='Write all bytes sent through the serial port to a file, - for stdout')
+    parser.add_argument('--frameskip', dest='frameskip', default=0, type=frameskip,
+                        help='Skip drawing of N frames after each drawn frame, or "auto" to skip while behind')
+    parser.add_argument('--speed', dest='speed', default=1.0, type=speed,
+                        help='Emulation speed multiplier, 1.0 is 59.73 FPS')
+    parser.add_argument('--turbo', dest='turbo', default=False, action='store_true',
+                        help='Start without frame limit, toggle with tab')
+    parser.add_argument('--rewind', dest='rewind', default=0, type=float,
+                        help='Keep the last N seconds for rewinding with r')
+    parser.add_argument('--rewind-memory', dest='rewind_memory', default=64, type=int,
+                        help='Memory limit of the rewind buffer in MB')
+    parser.add_argument('--record-movie', dest='record_movie', default=None, type=str,
+                        help='Record input of each frame to a movie file')
+    parser.add_argument('--play-movie', dest='play_movie', default=None, type=str,
+                        help='Replay input from a movie file instead of the keyboard')
+    parser.add_argument('--engine', dest='engine', default='reference', choices=['reference', 'fast', 'idioms'],
+                        help='Execution engine, fast runs batches of instructions in one loop, idioms also runs copy '
+                             'and fill loops as slice operations')
+    parser.add_argument('--profile', dest='profile', default=None, type=str,
+                        help='Profile opcodes, PCs and ROM banks and write the results to a JSON file on exit')
+    parser.add_argument('--trace', dest='trace', default=None, type=str,
+                        help='Trace executed instructions, written to the file on crash or SIGUSR1')
+    parser.add_argument('--trace-size', dest='trace_size', default=1 << 20, type=int,
+                        help='Number of instructions kept in the trace')
+    parser.add_argument('--debug', dest='debug', default=False, action='store_true',
+                        help='Start stopped in the debugger prompt, ctrl-c stops again, best with --display raw')
+    parser.add_argument('--break', dest='breakpoints', default=None, type=address, action='append',
+                        help='Stop in the debugger prompt at this hex address, can be repeated')
 
     args = parser.parse_args()
+    if args.engine != 'reference' and (args.profile or args.trace):
+        parser.error('profiling and tracing only work with the reference engine')
+    if args.audio == '-' and (args.audio_format != 'pcm' or args.display != 'raw' or args.output == '-' or args.debug
+                              or args.breakpoints):
+        parser.error('--audio - needs --audio-format pcm and --display raw with an --output file, nothing else may '
+                     'write to stdout')
 
     gameboy = CyBoy(args)
     gameboy.start()
@@ -4,13 +4,18 @@ import time
 
 WIDTH, HEIGHT = 160, 144
 
+# color numbers to grey levels, 0 is white
+shades = bytes([0xFF, 0xAA, 0x55, 0x00]) + bytes(252)
+
 
 class Display:
 
     def __init__(self, gameboy):
         self.mmu = gameboy.mmu
-        self.screenbuffer = [[0 for _ in range(WIDTH)] for _ in range(HEIGHT)]
-        self.background = [[0 for _ in range(256)] for _ in range(256)]
+        # color numbers 0-3 of 160x144 px, row by row
+        self.screenbuffer = bytearray(WIDTH * HEIGHT)
+        self.background = bytearray(256 * 256)
+        self.rgb = bytearray(b'\0\0\0\xFF' * WIDTH * HEIGHT)
         self.params = [(0, 0, 0, 0) for _ in range(256)]
         self.count, self.fps = 0, 0
         self.time = time.time()
@@ -24,6 +29,23 @@ class Display:
         self.render(self.screenbuffer)
         self.count_frame()
 
+    def buffer(self):
+        """
+        Zero-copy view of the screenbuffer with one byte (color number 0-3) per pixel, 160x144 px row by row,
+        e.g. numpy.frombuffer(display.buffer(), numpy.uint8).reshape(144, 160)
+        """
+        return memoryview(self.screenbuffer)
+
+    def rgb_buffer(self):
+        """
+        View of the screenbuffer as RGB32 with 4 bytes (R, G, B, 0xFF) per pixel, converted on each call
+        """
+
+        grey = self.screenbuffer.translate(shades)
+        for i in range(3):
+            self.rgb[i::4] = grey
+        return memoryview(self.rgb)
+
     def count_frame(self):
         self.count += 1
         if self.time + 1 < time.time():
@@ -52,15 +74,18 @@ class Display:
 
                 color = (palette >> (color * 2)) & 3
 
-                self.background[y + offset_y][x + offset_x] = color
+                self.background[(y + offset_y) * 256 + x + offset_x] = color
 
     def draw_visible_bg_area(self):
         for y in range(HEIGHT):
             scy, scx, wy, wx = self.params[y]
 
-            for x in range(WIDTH):
-                color = self.background[(y + scy) % 256][(x + scx) % 256]
-                self.screenbuffer[y][x] = color
+            offset = (y + scy) % 256 * 256
+            line = self.background[offset:offset + 256]
+            if scx + WIDTH > 256:
+                line = line + line
+
+            self.screenbuffer[y * WIDTH:(y + 1) * WIDTH] = line[scx:scx + WIDTH]
 
     def draw_sprites(self):
         """
@@ -108,4 +133,4 @@ class Display:
                 if color == 0:
                     continue
 
-                self.screenbuffer[y + offset_y][x + offset_x] = color
+                self.screenbuffer[(y + offset_y) * WIDTH + x + offset_x] = color
@@ -2,7 +2,7 @@
 
 import curses
 
-from display.display import Display
+from display.display import Display, WIDTH, HEIGHT
 
 colors = {0: '\u2588\u2588',
           1: '\u2592\u2592',
@@ -22,11 +22,13 @@ class CursesDisplay(Display):
         curses.init_pair(1, curses.COLOR_RED, curses.COLOR_WHITE)
 
     def render(self, screenbuffer, overlay=False):
-        for y in range(min(len(screenbuffer), curses.LINES - 1)):
-            self.scr.addstr(y, 0, "".join(
-                colors[screenbuffer[y][x]] for x in range(min(len(screenbuffer[0]), curses.COLS - 1))))
+        width = min(WIDTH, curses.COLS - 1)
+        for y in range(min(HEIGHT, curses.LINES - 1)):
+            self.scr.addstr(y, 0, "".join(colors[color] for color in screenbuffer[y * WIDTH:y * WIDTH + width]))
 
         if self.overlay:
-            self.scr.addstr(0, 0, "FPS: {}".format(self.gameboy.display.fps), curses.color_pair(1))
+            self.scr.addstr(0, 0, "FPS: {} Jitter: {:.2f}ms".format(self.gameboy.display.fps,
+                                                                    self.gameboy.pacer.stats()['jitter']),
+                            curses.color_pair(1))
 
         self.scr.refresh()
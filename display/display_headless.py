@@ -0,0 +1,12 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+from display.display import Display
+
+
+class HeadlessDisplay(Display):
+    """
+    Draws frames into the screenbuffer without presenting them
+    """
+
+    def render(self, screenbuffer):
+        pass
@@ -0,0 +1,41 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import sys
+
+from display.display import Display, WIDTH, HEIGHT, shades
+
+
+class RawDisplay(Display):
+    """
+    Streams every drawn frame as raw video to a file or to stdout, either as YUV4MPEG2 stream with a single grey plane
+    or as sequence of binary PPM images. Both can be consumed by an encoder, e.g.:
+
+        $ python cyboy.py --display raw --output - <rom> | ffmpeg -i - gameplay.mp4
+    """
+
+    def __init__(self, gameboy, output='-', format='y4m'):
+        super().__init__(gameboy)
+        self.file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+
+        if format == 'y4m':
+            self.file.write(b'YUV4MPEG2 W%d H%d F4194304:70224 Ip A1:1 Cmono\n' % (WIDTH, HEIGHT))
+            header = b'FRAME\n'
+            channels = 1
+        elif format == 'ppm':
+            header = b'P6\n%d %d\n255\n' % (WIDTH, HEIGHT)
+            channels = 3
+        else:
+            raise ValueError('unknown raw video format {}'.format(format))
+
+        # header and pixels of a frame are written with a single write from the same buffer
+        self.buffer = bytearray(header) + bytearray(WIDTH * HEIGHT * channels)
+        self.pixels = memoryview(self.buffer)[len(header):]
+        self.channels = channels
+
+    def render(self, screenbuffer):
+        grey = screenbuffer.translate(shades)
+        for i in range(self.channels):
+            self.pixels[i::self.channels] = grey
+
+        self.file.write(self.buffer)
+        self.file.flush()
@@ -0,0 +1,117 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import atexit
+import multiprocessing
+import struct
+from multiprocessing import shared_memory
+
+from display.display import Display, WIDTH, HEIGHT
+
+"""
+Shared memory layout
+  0x00  published - sequence number of the latest complete frame
+  0x08  pending   - sequence number of the frame being written
+  0x10  fps       - emulated frames per second
+  0x14  jitter    - frame time jitter in ms
+  0x18  frame buffer 0 (160x144 color numbers), holds even sequence numbers
+  ....  frame buffer 1, holds odd sequence numbers
+"""
+
+HEADER = struct.Struct('<QQIf')
+SIZE = WIDTH * HEIGHT
+
+
+class SharedDisplay(Display):
+    """
+    Publishes finished frames into a double buffer in shared memory and leaves presenting them to a separate renderer
+    process with the actual display backend, so drawing to the terminal runs on another core than the emulation.
+    The frame is always written into the buffer that is not published, a renderer only takes a copy of the
+    published buffer if no newer frame was started in the meantime.
+    """
+
+    def __init__(self, gameboy, backend, **options):
+        super().__init__(gameboy)
+        self.gameboy = gameboy
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER.size + 2 * SIZE)
+        self.buffers = [self.shm.buf[HEADER.size + i * SIZE:HEADER.size + (i + 1) * SIZE] for i in range(2)]
+        self.seq = 0
+        self.ready = multiprocessing.Event()
+        # pacer statistics are only computed for the overlay, they are too slow for every frame otherwise
+        self.overlay = options.get('overlay', False)
+
+        self.process = multiprocessing.Process(target=present, args=(self.shm.name, self.ready, backend, options))
+        self.process.daemon = True
+        self.process.start()
+
+        atexit.register(self.close)
+
+    def render(self, screenbuffer):
+        seq = self.seq + 1
+        fps, jitter = self.fps, self.gameboy.pacer.stats()['jitter'] if self.overlay else 0
+
+        HEADER.pack_into(self.shm.buf, 0, self.seq, seq, fps, jitter)
+        self.buffers[seq & 1][:] = screenbuffer
+
+        HEADER.pack_into(self.shm.buf, 0, seq, seq, fps, jitter)
+        self.seq = seq
+        self.ready.set()
+
+    def close(self):
+        atexit.unregister(self.close)
+        self.process.terminate()
+        self.buffers = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class Remote:
+    """
+    Stands in for the gameboy in the renderer process, display backends only read FPS and pacer statistics from it
+    """
+
+    mmu = None
+
+    def __init__(self):
+        self.display = self
+        self.pacer = self
+        self.fps, self.jitter = 0, 0
+
+    def stats(self):
+        return {'jitter': self.jitter}
+
+
+def present(name, ready, backend, options):
+    """
+    Main-loop of the renderer process, presents the latest complete frame whenever a new one was published
+    """
+
+    shm = shared_memory.SharedMemory(name=name)
+    buffers = [shm.buf[HEADER.size + i * SIZE:HEADER.size + (i + 1) * SIZE] for i in range(2)]
+    remote = Remote()
+
+    if backend == 'raw':
+        from display.display_raw import RawDisplay
+        display = RawDisplay(remote, options['output'], options['format'])
+    else:
+        from display.display_curses import CursesDisplay
+        display = CursesDisplay(remote, options['overlay'])
+
+    seq = 0
+    while 1:
+        ready.wait()
+        ready.clear()
+
+        published, _, remote.fps, remote.jitter = HEADER.unpack_from(shm.buf)
+        if published == seq:
+            continue
+
+        display.screenbuffer[:] = buffers[published & 1]
+
+        # writer already started on the buffer we copied from
+        _, pending, _, _ = HEADER.unpack_from(shm.buf)
+        if pending > published + 1:
+            ready.set()
+            continue
+
+        seq = published
+        display.render(display.screenbuffer)
@@ -0,0 +1,386 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import atexit
+import math
+import sys
+import wave
+
+import numpy as np
+
+"""
+Sound Controller, registers FF10-FF3F
+  FF10-FF14   Channel 1, square wave with sweep: sweep, duty/length, envelope, frequency low, trigger/frequency high
+  FF16-FF19   Channel 2, square wave: duty/length, envelope, frequency low, trigger/frequency high
+  FF1A-FF1E   Channel 3, wave: DAC enable, length, output level, frequency low, trigger/frequency high
+  FF20-FF23   Channel 4, noise: length, envelope, polynomial counter, trigger
+  FF24        NR50 - master volume left (bit 6-4) and right (bit 2-0)
+  FF25        NR51 - channels to the left (bit 7-4) and right (bit 3-0) output
+  FF26        NR52 - sound on/off (bit 7), channel status (bit 3-0, read only)
+  FF30-FF3F   wave pattern RAM, 32 4-bit samples
+
+Register writes are recorded with the cycle they happened at, the samples of a whole frame are synthesised at once.
+Cycles are counted per batch of instructions the CPU runs, about 100 cycles, which is close to one sample at 48 kHz.
+"""
+
+CLOCK = 4194304
+# the frame sequencer clocks length counters, sweep and envelopes at 512 Hz
+SEQUENCER = CLOCK // 512
+
+DUTY = np.array([
+    [0, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 0, 0, 1],
+    [1, 0, 0, 0, 0, 1, 1, 1],
+    [0, 1, 1, 1, 1, 1, 1, 0],
+], dtype=np.float64) * 2 - 1
+
+# output level of channel 3: mute, 100%, 50%, 25%
+LEVELS = [0, 1, 0.5, 0.25]
+
+DIVISORS = [8, 16, 32, 48, 64, 80, 96, 112]
+
+SILENCE = (np.zeros(1), 0.0, 0.0, 0.0)
+
+
+def lfsr(width):
+    """
+    :param width: 15 or 7 bit mode of the noise channel
+    :return: output of the noise LFSR over one period
+    """
+
+    state, bits = 0x7FFF, []
+    for _ in range((1 << width) - 1):
+        bit = (state ^ state >> 1) & 1
+        state = state >> 1 | bit << 14
+        if width == 7:
+            state = state & ~0x40 | bit << 6
+        bits.append(~state & 1)
+
+    return np.array(bits, dtype=np.float64) * 2 - 1
+
+
+class Channel:
+
+    enabled = False
+    dac = False
+    length = 0
+    length_enable = False
+    volume = 0
+    envelope_timer = 0
+    # 11 bit frequency of the square and wave channels
+    frequency = 0
+    duty = 0
+
+    def __init__(self, max_length):
+        self.max_length = max_length
+
+
+class APU:
+    """
+    Square, wave and noise channels with frame sequencer. Samples are written as 16 bit stereo to a WAV file or as raw
+    PCM, so no sound device is needed.
+    """
+
+    noise = {15: None, 7: None}
+
+    def __init__(self, gameboy, output, format='wav', rate=48000):
+        """
+        :param output: file name, - for stdout (raw PCM only)
+        :param format: wav or pcm (signed 16 bit little endian, interleaved stereo)
+        :param rate: sample rate
+        """
+
+        self.gameboy = gameboy
+        self.rate = rate
+        # cycles per sample
+        self.period = CLOCK / rate
+
+        self.channels = [Channel(64), Channel(64), Channel(256), Channel(64)]
+        self.phases = [0.0] * 4
+        # FF10-FF3F as written
+        self.regs = bytearray(0x30)
+        self.power = True
+
+        # sweep of channel 1
+        self.sweep_enabled = False
+        self.sweep_timer = 0
+        self.shadow = 0
+
+        # register writes of the current frame as (cycle, addr, value)
+        self.writes = []
+        # cycle the samples are rendered up to, position of the next sample in cycles
+        self.time = 0
+        self.sample = 0.0
+        # frame sequencer step 0-7
+        self.step = 0
+
+        if APU.noise[15] is None:
+            APU.noise = {15: lfsr(15), 7: lfsr(7)}
+        self.waves = {}
+
+        self.format = format
+        if format == 'wav':
+            self.file = wave.open(output, 'wb')
+            self.file.setnchannels(2)
+            self.file.setsampwidth(2)
+            self.file.setframerate(rate)
+        else:
+            self.file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        atexit.register(self.close)
+
+    def close(self):
+        atexit.unregister(self.close)
+        self.file.close()
+
+    def write(self, addr, value):
+        self.writes.append((self.gameboy.cpu.cycles, addr, value))
+
+    def render(self):
+        """
+        Synthesise the samples up to the current cycle and write them, called after every frame
+        """
+
+        end = self.gameboy.cpu.cycles
+        writes, self.writes = self.writes, []
+        counts, params = [], []
+
+        tick = (self.time // SEQUENCER + 1) * SEQUENCER
+        for cycle, addr, value in writes + [(end, None, None)]:
+            while tick <= cycle:
+                self.segment(tick, counts, params)
+                self.sequence()
+                tick += SEQUENCER
+
+            self.segment(cycle, counts, params)
+            if addr is not None:
+                self.apply(addr, value)
+
+        self.gameboy.mmu.ram[0xFF26] = self.power << 7 | 0x70 | sum(
+            channel.enabled << n for n, channel in enumerate(self.channels))
+
+        if not counts:
+            return
+
+        counts = np.array(counts)
+        left, right = 0, 0
+        for n in range(4):
+            samples, gains = self.synthesize(n, counts, [segment[n] for segment in params])
+            left = left + samples * gains[0]
+            right = right + samples * gains[1]
+
+        samples = np.empty((counts.sum(), 2), dtype=np.int16)
+        samples[:, 0] = np.clip(left * 32767, -32768, 32767)
+        samples[:, 1] = np.clip(right * 32767, -32768, 32767)
+
+        if self.format == 'wav':
+            self.file.writeframes(samples.tobytes())
+        else:
+            self.file.write(samples.tobytes())
+
+    def segment(self, cycle, counts, params):
+        """
+        Add the samples up to the cycle with the current channel parameters
+        """
+
+        if cycle > self.sample:
+            count = math.ceil((cycle - self.sample) / self.period)
+            self.sample += count * self.period
+            counts.append(count)
+            params.append(self.params())
+
+        self.time = cycle
+
+    def params(self):
+        """
+        :return: table, phase step per sample, left and right gain of each channel
+        """
+
+        nr50, nr51 = self.regs[0x14], self.regs[0x15]
+        left = ((nr50 >> 4 & 7) + 1) / 32
+        right = ((nr50 & 7) + 1) / 32
+
+        result = []
+        for n, channel in enumerate(self.channels):
+            if not channel.enabled:
+                result.append(SILENCE)
+                continue
+
+            if n < 2:
+                table = DUTY[channel.duty]
+                step = CLOCK / 4 / (2048 - channel.frequency) / self.rate
+                gain = channel.volume / 15
+            elif n == 2:
+                table = self.wave()
+                step = CLOCK / 2 / (2048 - channel.frequency) / self.rate
+                gain = LEVELS[self.regs[0x0C] >> 5 & 3]
+            else:
+                poly = self.regs[0x12]
+                table = self.noise[7 if poly & 8 else 15]
+                step = CLOCK / (DIVISORS[poly & 7] << (poly >> 4)) / self.rate if poly >> 4 < 14 else 0.0
+                gain = channel.volume / 15
+
+            result.append((table, step, gain * left * (nr51 >> 4 + n & 1), gain * right * (nr51 >> n & 1)))
+
+        return result
+
+    def wave(self):
+        """
+        :return: wave pattern RAM as table
+        """
+
+        data = bytes(self.regs[0x20:0x30])
+        table = self.waves.get(data)
+        if table is None:
+            samples = np.frombuffer(data, dtype=np.uint8)
+            table = np.stack([samples >> 4, samples & 0xF], axis=1).reshape(32) / 7.5 - 1
+            self.waves[data] = table
+        return table
+
+    def synthesize(self, n, counts, params):
+        """
+        :return: samples of a channel for the frame, left and right gain of each sample
+        """
+
+        tables, offsets, periods, steps, left, right = [], [], [], [], [], []
+        index, size = {}, 0
+        for table, step, left_gain, right_gain in params:
+            if id(table) not in index:
+                index[id(table)] = size
+                tables.append(table)
+                size += len(table)
+            offsets.append(index[id(table)])
+            periods.append(len(table))
+            steps.append(step)
+            left.append(left_gain)
+            right.append(right_gain)
+
+        step = np.repeat(steps, counts)
+        phase = self.phases[n] + np.cumsum(step) - step
+        self.phases[n] = (phase[-1] + step[-1]) % periods[-1]
+
+        position = np.repeat(offsets, counts) + phase.astype(np.int64) % np.repeat(periods, counts)
+        samples = np.concatenate(tables)[position]
+
+        return samples, (np.repeat(left, counts), np.repeat(right, counts))
+
+    def sequence(self):
+        """
+        One step of the frame sequencer
+        """
+
+        if self.step % 2 == 0:
+            for channel in self.channels:
+                if channel.length_enable and channel.length:
+                    channel.length -= 1
+                    if not channel.length:
+                        channel.enabled = False
+
+        if self.step in (2, 6):
+            self.sweep()
+
+        if self.step == 7:
+            for n in (0, 1, 3):
+                channel = self.channels[n]
+                envelope = self.regs[n * 5 + 2]
+                if envelope & 7:
+                    channel.envelope_timer -= 1
+                    if channel.envelope_timer <= 0:
+                        channel.envelope_timer = envelope & 7
+                        if envelope & 8 and channel.volume < 15:
+                            channel.volume += 1
+                        elif not envelope & 8 and channel.volume > 0:
+                            channel.volume -= 1
+
+        self.step = (self.step + 1) % 8
+
+    def sweep(self):
+        sweep = self.regs[0x00]
+        self.sweep_timer -= 1
+        if self.sweep_timer > 0:
+            return
+
+        self.sweep_timer = sweep >> 4 & 7 or 8
+        if self.sweep_enabled and sweep >> 4 & 7:
+            frequency = self.sweep_frequency()
+            if frequency <= 2047 and sweep & 7:
+                self.shadow = self.channels[0].frequency = frequency
+                self.sweep_frequency()
+
+    def sweep_frequency(self):
+        """
+        :return: next frequency of the sweep, disables channel 1 on overflow
+        """
+
+        sweep = self.regs[0x00]
+        delta = self.shadow >> (sweep & 7)
+        frequency = self.shadow - delta if sweep & 8 else self.shadow + delta
+        if frequency > 2047:
+            self.channels[0].enabled = False
+        return frequency
+
+    def apply(self, addr, value):
+        """
+        Register write, in order at its cycle
+        """
+
+        if addr == 0xFF26:
+            self.power = bool(value & 0x80)
+            if not self.power:
+                for channel in self.channels:
+                    channel.enabled = False
+                self.regs[:0x16] = bytes(0x16)
+            return
+
+        if addr < 0xFF30 and not self.power:
+            return
+
+        reg = addr - 0xFF10
+        self.regs[reg] = value
+        if reg >= 0x14:
+            # master volume, panning, wave RAM
+            return
+
+        n, slot = divmod(reg, 5)
+        channel = self.channels[n]
+
+        if slot == 0 and n == 2:
+            channel.dac = bool(value & 0x80)
+            if not channel.dac:
+                channel.enabled = False
+        elif slot == 1:
+            if n < 2:
+                channel.duty = value >> 6
+            channel.length = channel.max_length - (value & channel.max_length - 1)
+        elif slot == 2 and n != 2:
+            channel.dac = bool(value & 0xF8)
+            if not channel.dac:
+                channel.enabled = False
+        elif slot == 3 and n != 3:
+            channel.frequency = channel.frequency & 0x700 | value
+        elif slot == 4:
+            if n != 3:
+                channel.frequency = (value & 7) << 8 | channel.frequency & 0xFF
+            channel.length_enable = bool(value & 0x40)
+            if value & 0x80:
+                self.trigger(n)
+
+    def trigger(self, n):
+        channel = self.channels[n]
+        channel.enabled = channel.dac
+        if not channel.length:
+            channel.length = channel.max_length
+
+        if n != 2:
+            channel.volume = self.regs[n * 5 + 2] >> 4
+            channel.envelope_timer = self.regs[n * 5 + 2] & 7
+
+        if n >= 2:
+            # wave position and LFSR start over
+            self.phases[n] = 0.0
+
+        if n == 0:
+            sweep = self.regs[0x00]
+            self.shadow = channel.frequency
+            self.sweep_timer = sweep >> 4 & 7 or 8
+            self.sweep_enabled = bool(sweep & 0x77)
+            if sweep & 7:
+                self.sweep_frequency()
@@ -11,17 +11,29 @@ class CPU:
     PC = 0
 
     ime = True
+    # set by HALT until an interrupt is requested
+    halted = False
+
+    # emulated cycles, counted per batch of instructions
+    cycles = 0
 
     def __init__(self, gameboy):
         self.gameboy = gameboy
         self.mmu = gameboy.mmu
+        self.controls = gameboy.controls
         self.display = gameboy.display
+        self.frameskip = gameboy.frameskip
+        self.serial = gameboy.mmu.serial
         self.instructions = Instructions()
 
     def next_frame(self):
         """
         Resolution   - 160x144 (20x18 tiles)
         """
+
+        self.controls.latch()
+        self.mmu.check_joypad_interrupt()
+
         if not self.mmu.lcd_display_enable():
             self.mmu.set_mode(0)
             self.mmu.set_ly(0)
@@ -51,7 +63,11 @@ class CPU:
             self.next_instructions(204)
 
         self.mmu.set_vblank()
-        self.display.draw()
+
+        if self.frameskip.draw():
+            self.display.draw()
+        else:
+            self.display.count_frame()
 
         for i in range(144, 153):
             self.mmu.set_ly(i)
@@ -100,7 +116,18 @@ class CPU:
         return cycles
 
     def next_instructions(self, cycles):
-        while cycles > 0:
+        self.cycles += cycles
+
+        if self.serial.due <= self.cycles:
+            self.serial.complete()
+
+        if self.halted:
+            if not self.mmu.ram[0xFFFF] & self.mmu.ram[0xFF0F] & 0x1F:
+                # interrupts are only requested in between, nothing happens until the end of the cycles
+                return
+            self.halted = False
+
+        while cycles > 0 and not self.halted:
             cycles -= self.next_instruction()
 
     def check_interrupt(self):
@@ -0,0 +1,255 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import code
+
+from gameboy.lockstep import peek
+from gameboy.trace import disassemble
+
+"""
+Commands of the debugger prompt, addresses in hex
+  c                   continue
+  s [N]               execute N instructions, 1 by default
+  b ADDR              set breakpoint
+  d ADDR              delete breakpoint or watchpoint
+  w ADDR              watch writes
+  r ADDR              watch reads
+  l                   list breakpoints and watchpoints
+  x ADDR [N]          show N bytes of memory
+  u [ADDR] [N]        disassemble N instructions
+  p                   show registers
+  py                  Python console with gameboy, cpu, mmu and debugger
+  q                   quit
+"""
+
+
+class Debugger:
+    """
+    PC breakpoints and memory watchpoints. While none are set, the CPU and MMU run their normal methods, the checking
+    versions are only swapped in while something is armed.
+    """
+
+    def __init__(self, gameboy, on_break=None):
+        """
+        :param on_break: called with the debugger and the reason when stopped, the command prompt by default
+        """
+
+        self.gameboy = gameboy
+        self.cpu = gameboy.cpu
+        self.mmu = gameboy.mmu
+        self.on_break = on_break or Debugger.prompt
+
+        self.breakpoints = bytearray(0x10000)
+        self.reads = set()
+        self.writes = set()
+        # instructions to execute before stopping, 0 to run until a breakpoint
+        self.steps = 0
+
+        # methods replaced while armed
+        self.inner = None
+
+    def add_breakpoint(self, addr):
+        self.breakpoints[addr] = 1
+        self.arm()
+
+    def watch(self, addr, read=False, write=True):
+        if read:
+            self.reads.add(addr)
+        if write:
+            self.writes.add(addr)
+        self.arm()
+
+    def remove(self, addr):
+        """
+        Remove breakpoint and watchpoints at an address
+        """
+
+        self.breakpoints[addr] = 0
+        self.reads.discard(addr)
+        self.writes.discard(addr)
+        self.arm()
+
+    def clear(self):
+        """
+        Remove all breakpoints and watchpoints
+        """
+
+        self.breakpoints[:] = bytes(0x10000)
+        self.reads.clear()
+        self.writes.clear()
+        self.steps = 0
+        self.arm()
+
+    def step(self, count=1):
+        """
+        Stop again after count instructions
+        """
+
+        self.steps = count
+        self.arm()
+
+    def arm(self):
+        """
+        Swap the checking methods in or out, depending on what is set
+        """
+
+        cpu, mmu = self.cpu, self.mmu
+        armed = self.steps or self.reads or self.writes or any(self.breakpoints)
+
+        if armed and self.inner is None:
+            # engines running batches don't call next_instruction or access memory without the MMU, the CPU loop is
+            # used while anything is armed
+            self.inner = vars(cpu).pop('next_instructions', None), cpu.next_instruction
+            cpu.next_instruction = self.next_instruction
+        elif not armed and self.inner is not None:
+            next_instructions, next_instruction = self.inner
+            del cpu.next_instruction
+            if getattr(next_instruction, '__self__', None) is not cpu:
+                cpu.next_instruction = next_instruction
+            if next_instructions:
+                cpu.next_instructions = next_instructions
+            self.inner = None
+
+        if self.reads:
+            mmu.read = self.read
+        else:
+            vars(mmu).pop('read', None)
+
+        if self.writes:
+            mmu.write = self.write
+        else:
+            vars(mmu).pop('write', None)
+
+    def next_instruction(self):
+        cpu = self.cpu
+        # stopping may disarm
+        inner = self.inner[1]
+
+        # interrupts change the PC, check them before looking at the breakpoint
+        cpu.check_interrupt()
+
+        if self.breakpoints[cpu.PC]:
+            # also ends stepping
+            self.steps = 0
+            self.stop('breakpoint')
+        elif self.steps:
+            self.steps -= 1
+            if not self.steps:
+                self.stop('step')
+
+        return inner()
+
+    def read(self, addr):
+        value = type(self.mmu).read(self.mmu, addr)
+        if addr in self.reads:
+            self.stop('read ${:04X} = ${:02X}'.format(addr, value))
+        return value
+
+    def write(self, addr, value):
+        type(self.mmu).write(self.mmu, addr, value)
+        if addr in self.writes:
+            self.stop('write ${:04X} = ${:02X}'.format(addr, value))
+
+    def stop(self, reason):
+        self.on_break(self, reason)
+        # the prompt may have changed breakpoints and watchpoints
+        self.arm()
+
+    def registers(self):
+        cpu = self.cpu
+        return 'A={:02X} F={:02X} B={:02X} C={:02X} D={:02X} E={:02X} H={:02X} L={:02X} SP={:04X} PC={:04X} ' \
+               'IME={:d} flags={}'.format(cpu.A, cpu.F, cpu.B, cpu.C, cpu.D, cpu.E, cpu.H, cpu.L, cpu.SP, cpu.PC,
+                                          cpu.ime, ''.join(f if cpu.F >> bit & 1 else '-'
+                                                           for f, bit in zip('ZNHC', (7, 6, 5, 4))))
+
+    def disassemble(self, addr, count=1):
+        """
+        :return: lines of count instructions starting at addr
+        """
+
+        lines = []
+        for _ in range(count):
+            op = peek(self.gameboy, addr)
+            operands = peek(self.gameboy, addr + 1) | peek(self.gameboy, addr + 2) << 8
+            if op == 0xCB:
+                op, operands, length = 0x100 | operands & 0xFF, operands >> 8, 2
+            else:
+                length = self.cpu.instructions.opcodes[op][0] if op in self.cpu.instructions.opcodes else 1
+
+            lines.append('{} ${:04X}  {}'.format('>' if addr == self.cpu.PC else ' ', addr,
+                                                disassemble(addr, op, operands)))
+            addr = addr + length & 0xFFFF
+        return lines
+
+    def prompt(self, reason):
+        """
+        Command prompt, returns when the emulation continues
+        """
+
+        controls = self.gameboy.controls
+        if hasattr(controls, 'suspend'):
+            controls.suspend()
+
+        print('stopped: {}'.format(reason))
+        print(self.registers())
+        print('\n'.join(self.disassemble(self.cpu.PC)))
+
+        try:
+            while True:
+                try:
+                    words = input('(cyboy) ').split()
+                except EOFError:
+                    words = ['q']
+                if not words:
+                    continue
+
+                try:
+                    command, args = words[0], [int(word.lstrip('$'), 16) for word in words[1:]]
+
+                    if command == 'c':
+                        return
+                    elif command == 's':
+                        self.steps = args[0] if args else 1
+                        return
+                    elif command == 'q':
+                        self.clear()
+                        controls.done = True
+                        return
+                    elif command == 'b':
+                        self.breakpoints[args[0]] = 1
+                    elif command == 'd':
+                        self.breakpoints[args[0]] = 0
+                        self.reads.discard(args[0])
+                        self.writes.discard(args[0])
+                    elif command == 'w':
+                        self.writes.add(args[0])
+                    elif command == 'r':
+                        self.reads.add(args[0])
+                    elif command == 'l':
+                        for addr in range(0x10000):
+                            if self.breakpoints[addr]:
+                                print('breakpoint ${:04X}'.format(addr))
+                        for addr in sorted(self.reads):
+                            print('read       ${:04X}'.format(addr))
+                        for addr in sorted(self.writes):
+                            print('write      ${:04X}'.format(addr))
+                    elif command == 'x':
+                        addr, count = args[0], args[1] if len(args) > 1 else 16
+                        for row in range(addr, addr + count, 16):
+                            print('${:04X}  {}'.format(row, ' '.join('{:02X}'.format(peek(self.gameboy, a))
+                                                                     for a in range(row, min(row + 16, addr + count)))))
+                    elif command == 'u':
+                        addr = args[0] if args else self.cpu.PC
+                        print('\n'.join(self.disassemble(addr, args[1] if len(args) > 1 else 10)))
+                    elif command == 'p':
+                        print(self.registers())
+                    elif command == 'py':
+                        code.interact(local={'gameboy': self.gameboy, 'cpu': self.cpu, 'mmu': self.mmu,
+                                             'debugger': self})
+                    else:
+                        print('unknown command {}'.format(command))
+                except (ValueError, IndexError):
+                    print('invalid address in {}'.format(' '.join(words)))
+        finally:
+            if hasattr(controls, 'resume'):
+                controls.resume()
+
@@ -0,0 +1,88 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+from controls.controls import Controls
+from display.display_headless import HeadlessDisplay
+from gameboy import state
+from gameboy.cpu import CPU
+from gameboy.mmu import MMU
+
+
+class Emulator:
+    """
+    Headless gameboy to be driven by other programs, without curses, command line arguments, threads or frame
+    limiting. Buttons are given as bit mask with a set bit for each pressed button, see controls.controls.
+
+        emulator = Emulator('tetris.gb')
+        emulator.step(60, buttons=1 << START)
+        frame = numpy.frombuffer(emulator.get_frame(), numpy.uint8).reshape(144, 160)
+    """
+
+    def __init__(self, rom):
+        """
+        :param rom: path to rom file or its content
+        """
+
+        self.controls = Controls()
+        self.mmu = MMU(self, rom)
+        self.display = HeadlessDisplay(self)
+        self.frameskip = self
+        self.cpu = CPU(self)
+        self.cpu.instructions.build(self)
+
+        self.frames = 0
+        self.drawing = True
+        self.initial = self.save_state()
+
+    def draw(self):
+        """
+        Frameskip policy of the emulator, only the last frame of a step gets drawn
+        """
+        return self.frames == 1 and self.drawing
+
+    def step(self, frames=1, buttons=None, draw=True):
+        """
+        Emulate the given number of frames
+        :param buttons: pressed buttons during these frames, None to keep the previous ones
+        :param draw: draw the last frame, get_frame() keeps returning the previous one otherwise
+        """
+
+        if buttons is not None:
+            self.controls.keys = ~buttons & 0xFF
+
+        self.frames = frames
+        self.drawing = draw
+        next_frame = self.cpu.next_frame
+
+        while self.frames:
+            next_frame()
+            self.frames -= 1
+
+    def get_frame(self):
+        """
+        :return: memoryview of the last drawn frame, one color number (0-3) per pixel, 160x144 px row by row
+        """
+        return self.display.buffer()
+
+    def read_memory(self, addr, n=1):
+        """
+        :return: memoryview of n bytes starting at addr, the ROM area 0x0000-0x7FFF is not part of the memory
+        """
+        return memoryview(self.mmu.ram)[addr:addr + n]
+
+    def serial_output(self):
+        """
+        :return: all bytes sent through the serial port, test ROMs report their results this way
+        """
+        return bytes(self.mmu.serial.output)
+
+    def save_state(self):
+        return state.save(self)
+
+    def load_state(self, data):
+        state.load(self, data)
+
+    def reset(self, data=None):
+        """
+        Go back to a saved state or power-on if none is given
+        """
+        self.load_state(data if data is not None else self.initial)
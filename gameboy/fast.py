@@ -0,0 +1,111 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+
+class FastEngine:
+    """
+    Executes the same ops as CPU.next_instruction, but runs a whole batch of instructions in one loop with fetch and
+    decode inlined and the interrupt check skipped while nothing is pending. Swapped into the CPU by install() like the
+    profiler, gameboy.lockstep compares it with the reference interpreter.
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+
+    def install(self):
+        self.cpu.next_instructions = self.next_instructions
+
+    def uninstall(self):
+        del self.cpu.next_instructions
+
+    def next_instruction(self):
+        """
+        Execute a single instruction
+        :return: cycles
+        """
+
+        cpu = self.cpu
+        ram = cpu.mmu.ram
+        read = cpu.mmu.read
+
+        if cpu.ime and ram[0xFFFF] & ram[0xFF0F] & 0x1F:
+            cpu.check_interrupt()
+
+        pc = cpu.PC
+        inst = read(pc)
+        pc = pc + 1 & 0xFFFF
+        if inst == 0xCB:
+            length, cycles, op = cpu.instructions.cb[read(pc)]
+            pc = pc + 1 & 0xFFFF
+        else:
+            length, cycles, op = cpu.instructions.opcodes[inst]
+
+        if length == 1:
+            cpu.PC = pc
+            op(cpu.gameboy)
+        elif length == 2:
+            cpu.PC = pc + 1 & 0xFFFF
+            op(cpu.gameboy, read(pc))
+        else:
+            value = read(pc) | read(pc + 1 & 0xFFFF) << 8
+            cpu.PC = pc + 2 & 0xFFFF
+            op(cpu.gameboy, value)
+
+        return cycles
+
+    def loop(self, cycles):
+        """
+        Called when a JR NZ jumped back to the start of a loop at PC, engines extending the batch loop can run
+        iterations of it here
+        :param cycles: cycles left in the batch
+        :return: cycles used
+        """
+        return 0
+
+    def next_instructions(self, cycles):
+        cpu = self.cpu
+        cpu.cycles += cycles
+
+        if cpu.serial.due <= cpu.cycles:
+            cpu.serial.complete()
+
+        ram = cpu.mmu.ram
+        if cpu.halted:
+            if not ram[0xFFFF] & ram[0xFF0F] & 0x1F:
+                return
+            cpu.halted = False
+
+        read = cpu.mmu.read
+        opcodes = cpu.instructions.opcodes
+        cb = cpu.instructions.cb
+        gameboy = cpu.gameboy
+        check_interrupt = cpu.check_interrupt
+
+        while cycles > 0 and not cpu.halted:
+            if cpu.ime and ram[0xFFFF] & ram[0xFF0F] & 0x1F:
+                check_interrupt()
+
+            pc = cpu.PC
+            inst = read(pc)
+            pc = pc + 1 & 0xFFFF
+            if inst == 0xCB:
+                length, op_cycles, op = cb[read(pc)]
+                pc = pc + 1 & 0xFFFF
+            else:
+                length, op_cycles, op = opcodes[inst]
+
+            if length == 1:
+                cpu.PC = pc
+                op(gameboy)
+            elif length == 2:
+                cpu.PC = pc + 1 & 0xFFFF
+                op(gameboy, read(pc))
+            else:
+                value = read(pc) | read(pc + 1 & 0xFFFF) << 8
+                cpu.PC = pc + 2 & 0xFFFF
+                op(gameboy, value)
+
+            cycles -= op_cycles
+
+            # JR NZ taken backwards
+            if inst == 0x20 and cpu.PC < pc:
+                cycles -= self.loop(cycles)
@@ -0,0 +1,93 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import gc
+import itertools
+import os
+import traceback
+from multiprocessing import connection, Pipe
+
+
+class ForkServer:
+    """
+    Runs trials from a warm emulator. For each trial a child is forked from the current state, which inherits memory,
+    CPU and decode tables copy-on-write, so neither booting the ROM nor getting to the interesting point has to be
+    repeated. Results are sent back through a pipe.
+
+        emulator = Emulator('tetris.gb')
+        emulator.step(600)
+        results = ForkServer(emulator).run(sequences, lambda emulator: emulator.read_memory(0xC0A0, 3).tobytes())
+    """
+
+    def __init__(self, emulator, jobs=None):
+        """
+        :param jobs: number of children running at the same time, one per cpu by default
+        """
+        self.emulator = emulator
+        self.jobs = jobs or os.cpu_count()
+
+    def run(self, trials, evaluate):
+        """
+        :param trials: list of input sequences, one button mask (bit set while pressed) per frame
+        :param evaluate: called with the emulator after a trial, returns a picklable result
+        :return: results in order of the trials, the exception if a trial failed
+        """
+
+        results = [None] * len(trials)
+        running = {}
+
+        # keep objects of the parent out of the garbage collector, that would touch and copy all their pages
+        gc.freeze()
+
+        try:
+            for i, trial in enumerate(trials):
+                while len(running) >= self.jobs:
+                    self.collect(running, results)
+
+                reader, writer = Pipe(duplex=False)
+                pid = os.fork()
+
+                if pid == 0:
+                    reader.close()
+                    self.trial(trial, evaluate, writer)
+
+                writer.close()
+                running[reader] = (i, pid)
+
+            while running:
+                self.collect(running, results)
+        finally:
+            gc.unfreeze()
+
+        return results
+
+    def trial(self, trial, evaluate, writer):
+        """
+        Runs in the child, never returns
+        """
+
+        # whatever happens, the child must not return into the loop of the parent
+        try:
+            try:
+                # runs of equal buttons are stepped at once, only the last frame of the trial is drawn
+                runs = [(buttons, len(list(frames))) for buttons, frames in itertools.groupby(trial)]
+                for i, (buttons, frames) in enumerate(runs):
+                    self.emulator.step(frames, buttons, draw=i == len(runs) - 1)
+                result = evaluate(self.emulator)
+            except BaseException as e:
+                result = RuntimeError(''.join(traceback.format_exception(e)))
+
+            writer.send(result)
+        finally:
+            os._exit(0)
+
+    def collect(self, running, results):
+        for reader in connection.wait(list(running)):
+            i, pid = running.pop(reader)
+
+            try:
+                results[i] = reader.recv()
+            except EOFError:
+                results[i] = RuntimeError('trial {} died without result'.format(i))
+
+            reader.close()
+            os.waitpid(pid, 0)
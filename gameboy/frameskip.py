@@ -0,0 +1,35 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+
+class FrameSkip:
+    """
+    Decides after each emulated frame if the screenbuffer gets drawn. With a fixed value N only every (N+1)-th frame
+    is drawn, with 'auto' drawing is skipped as long as emulation is behind real time. CPU and PPU timing are not
+    affected, only the call to Display.draw is left out.
+    """
+
+    # draw at least every n-th frame, even if emulation is still behind
+    max_skip = 9
+
+    def __init__(self, pacer, frameskip=0):
+        self.pacer = pacer
+        self.auto = frameskip == 'auto'
+        self.frameskip = 0 if self.auto else int(frameskip)
+        self.skipped = 0
+
+    def draw(self):
+        """
+        :return: True if the current frame should be drawn
+        """
+
+        if self.auto:
+            skip = self.pacer.behind()
+        else:
+            skip = self.skipped < self.frameskip
+
+        if skip and self.skipped < max(self.max_skip, self.frameskip):
+            self.skipped += 1
+            return False
+
+        self.skipped = 0
+        return True
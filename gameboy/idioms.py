@@ -0,0 +1,150 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+from gameboy.fast import FastEngine
+
+"""
+Copy and fill loops recognised by their code, the JR NZ at the end jumps back to the start of the loop
+  copy16      LD A,(HL+); LD (DE),A; INC DE; DEC BC; LD A,B; OR C; JR NZ    BC bytes
+  copy8       LD A,(HL+); LD (DE),A; INC DE; DEC B; JR NZ                   B bytes
+  fill        LD (HL+),A; DEC B; JR NZ                                      B bytes
+  fill_down   LD (HL-),A; DEC B; JR NZ                                      B bytes, downwards
+A counter of 0 means 65536 or 256 iterations.
+"""
+
+IDIOMS = {
+    bytes.fromhex('2A12130B78B120F8'): 'copy16',
+    bytes.fromhex('2A12130520FA'): 'copy8',
+    bytes.fromhex('220520FC'): 'fill',
+    bytes.fromhex('320520FC'): 'fill_down',
+}
+
+
+def writable(addr, count):
+    """
+    :return: True if the area only holds plain memory, writes to ROM (cartridge controls), I/O ports and IE have side
+             effects
+    """
+
+    end = addr + count
+    return 0x8000 <= addr and end <= 0xFF00 or 0xFF80 <= addr and end <= 0xFFFF
+
+
+class IdiomEngine(FastEngine):
+    """
+    FastEngine that executes recognised copy and fill loops as slice operations on MMU.ram. Loops are looked up when a
+    JR NZ jumps backwards, only loops in ROM are recognised. The iterations the interpreter would run in the remaining
+    cycles of the batch are done at once with A and the flags set as they would be, only the final iteration of the
+    loop is interpreted. Nothing is done while an interrupt is pending or when memory with side effects is involved.
+
+    A loop never runs past the end of its batch: modes, LY and interrupts are updated between batches, so the state
+    there stays the same as of the interpreter. Long copies thus still return to the interpreter every batch (at most
+    456 cycles, a few dozen iterations), which limits the speedup: about 3.5 times the frames per second of FastEngine
+    on the memcpy workload of bench.workloads.
+    """
+
+    def __init__(self, cpu):
+        super().__init__(cpu)
+
+        # loop start, with the ROM bank in the upper bits -> idiom and cycles per iteration, None if not recognised
+        self.loops = {}
+
+    def match(self, head):
+        """
+        :return: idiom and cycles per iteration of the loop starting at head, None if it isn't recognised
+        """
+
+        mbc = self.cpu.mmu.mbc
+        key = head if head < 0x4000 else head | mbc.rom_bank_number << 16
+
+        if key not in self.loops:
+            self.loops[key] = None
+            for code, idiom in IDIOMS.items():
+                if head + len(code) <= 0x7FFF and bytes(mbc.read(head + i) for i in range(len(code))) == code:
+                    cycles, addr = 0, 0
+                    while addr < len(code):
+                        length, op_cycles, _ = self.cpu.instructions.opcodes[code[addr]]
+                        cycles += op_cycles
+                        addr += length
+                    self.loops[key] = idiom, cycles
+                    break
+
+        return self.loops[key]
+
+    def source(self, addr, count):
+        """
+        :return: memory to copy as the CPU reads it, None if reading has side effects
+        """
+
+        end = addr + count
+        mbc = self.cpu.mmu.mbc
+        if end <= 0x4000:
+            data = mbc.rom[addr:end]
+        elif 0x4000 <= addr and end <= 0x7FFF:
+            start = (mbc.rom_bank_number - 1) * 0x4000 + addr
+            data = mbc.rom[start:start + count]
+        elif 0x7FFF <= addr and end <= 0xFF00 or 0xFF80 <= addr and end <= 0x10000:
+            data = self.cpu.mmu.ram[addr:end]
+        else:
+            return None
+
+        return data if len(data) == count else None
+
+    def loop(self, cycles):
+        """
+        Run the iterations of the loop at PC that fit into the batch at once
+        :param cycles: cycles left in the batch
+        :return: cycles used
+        """
+
+        cpu = self.cpu
+        ram = cpu.mmu.ram
+
+        loop = self.match(cpu.PC)
+        if loop is None or cpu.ime and ram[0xFFFF] & ram[0xFF0F] & 0x1F:
+            return 0
+
+        idiom, per_iteration = loop
+        iterations = (cpu.BC() or 0x10000) if idiom == 'copy16' else cpu.B or 0x100
+        # the interpreter would run every iteration starting with cycles left in the batch, the last iteration of the
+        # loop is left to it, it leaves the JR NZ
+        count = min(iterations - 1, (cycles - 1) // per_iteration)
+        if count <= 0:
+            return 0
+
+        hl = cpu.HL()
+        if idiom == 'fill_down':
+            start = hl - count + 1
+            if not writable(start, count):
+                return 0
+            ram[start:hl + 1] = bytes((cpu.A,)) * count
+            cpu.set_HL(hl - count)
+
+        elif idiom == 'fill':
+            if not writable(hl, count):
+                return 0
+            ram[hl:hl + count] = bytes((cpu.A,)) * count
+            cpu.set_HL(hl + count)
+
+        else:
+            de = cpu.DE()
+            data = self.source(hl, count)
+            # copying forwards into the area still to read repeats the data
+            if data is None or not writable(de, count) or hl < de < hl + count:
+                return 0
+            ram[de:de + count] = data
+            cpu.set_HL(hl + count)
+            cpu.set_DE(de + count)
+            cpu.A = data[-1]
+
+        # A and the flags as left by an iteration that isn't the last one
+        if idiom == 'copy16':
+            cpu.set_BC(cpu.BC() - count & 0xFFFF)
+            # LD A,B; OR C
+            cpu.A = cpu.B | cpu.C
+            cpu.F &= 0x0F
+        else:
+            cpu.B = cpu.B - count & 0xFF
+            # DEC B, C is kept
+            cpu.F = cpu.F & 0x1F | 0x40 | (0x20 if cpu.B & 0xF == 0xF else 0)
+
+        return count * per_iteration
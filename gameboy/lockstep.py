@@ -0,0 +1,231 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import zlib
+
+from gameboy.cpu import CPU
+from gameboy.emulator import Emulator
+from gameboy.fast import FastEngine
+from gameboy.idioms import IdiomEngine
+from gameboy.trace import disassemble
+
+"""
+Differential testing of an execution engine against the reference interpreter CPU.next_instruction. Two emulators run
+the same ROM and input, the second one with the engine installed, and are compared after every frame or after every
+batch of instructions (block) the CPU runs. At the first divergence the block is replayed instruction by instruction
+if the engine can execute single instructions, and a report of the first differing instruction, registers and memory
+is given.
+"""
+
+REGISTERS = ['B', 'C', 'D', 'E', 'H', 'L', 'A', 'F', 'SP', 'PC', 'ime', 'halted']
+
+
+class Stop(Exception):
+    pass
+
+
+def snapshot(emulator):
+    """
+    :return: registers and hash of the memory
+    """
+
+    cpu = emulator.cpu
+    return tuple(getattr(cpu, name) for name in REGISTERS) + (zlib.crc32(emulator.mmu.ram),)
+
+
+def run_frame(emulator, keys, log=None, stop=None):
+    """
+    Emulate a frame, with a log a snapshot is appended after every block
+    :param stop: stop the frame before this block
+    :return: False if stopped
+    """
+
+    emulator.controls.keys = keys
+    if log is None:
+        emulator.step()
+        return True
+
+    cpu = emulator.cpu
+    installed = vars(cpu).get('next_instructions')
+    inner = cpu.next_instructions
+
+    def next_instructions(cycles):
+        if len(log) == stop:
+            raise Stop()
+        inner(cycles)
+        log.append(snapshot(emulator))
+
+    cpu.next_instructions = next_instructions
+    try:
+        emulator.step()
+        return True
+    except Stop:
+        return False
+    finally:
+        if installed:
+            cpu.next_instructions = installed
+        else:
+            del cpu.next_instructions
+
+
+def differences(reference, engine):
+    """
+    :return: lines describing differing registers and memory
+    """
+
+    lines = []
+    for name in REGISTERS:
+        a, b = getattr(reference.cpu, name), getattr(engine.cpu, name)
+        if a != b:
+            lines.append('  {:6} reference {:>6} engine {:>6}'.format(name, hex(int(a)), hex(int(b))))
+
+    addrs = [addr for addr in range(0x10000) if reference.mmu.ram[addr] != engine.mmu.ram[addr]]
+    for addr in addrs[:8]:
+        lines.append('  ${:04X}  reference {:>6} engine {:>6}'.format(addr, hex(reference.mmu.ram[addr]),
+                                                                    hex(engine.mmu.ram[addr])))
+    if len(addrs) > 8:
+        lines.append('  ... {} bytes differ'.format(len(addrs)))
+
+    return lines
+
+
+def peek(emulator, addr):
+    """
+    Read memory without the side effects of MMU.read
+    """
+
+    addr &= 0xFFFF
+    return emulator.mmu.mbc.read(addr) if addr < 0x7FFF else emulator.mmu.ram[addr]
+
+
+def instruction(emulator):
+    """
+    :return: PC and disassembly of the next instruction
+    """
+
+    pc = emulator.cpu.PC
+    op = peek(emulator, pc)
+    operands = peek(emulator, pc + 1) | peek(emulator, pc + 2) << 8
+    if op == 0xCB:
+        op, operands = 0x100 | operands & 0xFF, operands >> 8
+    return '${:04X}  {}'.format(pc, disassemble(pc, op, operands))
+
+
+class Lockstep:
+
+    def __init__(self, rom, engine, inputs=None):
+        """
+        :param engine: engine class, constructed with the CPU and installed by install()
+        :param inputs: button states per frame as bytes, like movie files hold them
+        """
+
+        self.reference = Emulator(rom)
+        self.engine = Emulator(rom)
+        self.installed = engine(self.engine.cpu)
+        self.installed.install()
+        self.inputs = inputs or b''
+        self.frame = 0
+
+    def keys(self, frame):
+        return self.inputs[frame] if frame < len(self.inputs) else 0xFF
+
+    def run(self, frames, granularity='block'):
+        """
+        :param granularity: compare after every frame or block
+        :return: None if both stayed equal, report text of the first divergence otherwise
+        """
+
+        for _ in range(frames):
+            states = self.reference.save_state(), self.engine.save_state()
+            keys = self.keys(self.frame)
+
+            if granularity == 'frame':
+                run_frame(self.reference, keys)
+                run_frame(self.engine, keys)
+                equal = snapshot(self.reference) == snapshot(self.engine)
+            else:
+                logs = [], []
+                run_frame(self.reference, keys, logs[0])
+                run_frame(self.engine, keys, logs[1])
+                equal = logs[0] == logs[1] and snapshot(self.reference) == snapshot(self.engine)
+
+            if not equal:
+                return self.narrow(states, keys)
+            self.frame += 1
+
+        return None
+
+    def narrow(self, states, keys):
+        """
+        Replay the diverging frame to find the first differing block and instruction
+        :return: report text
+        """
+
+        self.reference.load_state(states[0])
+        self.engine.load_state(states[1])
+        logs = [], []
+        run_frame(self.reference, keys, logs[0])
+        run_frame(self.engine, keys, logs[1])
+
+        block = next((i for i, (a, b) in enumerate(zip(logs[0], logs[1])) if a != b), None)
+        if block is None:
+            lines = ['frame {}: diverged after the last block'.format(self.frame)]
+            return '\n'.join(lines + differences(self.reference, self.engine))
+
+        lines = ['frame {}, block {}: diverged'.format(self.frame, block)]
+
+        # replay up to the start of the block
+        self.reference.load_state(states[0])
+        self.engine.load_state(states[1])
+        run_frame(self.reference, keys, [], block)
+        run_frame(self.engine, keys, [], block)
+
+        step = getattr(self.installed, 'next_instruction', None)
+        if step:
+            history = []
+            for _ in range(1000):
+                history.append(instruction(self.reference))
+                CPU.next_instruction(self.reference.cpu)
+                step()
+                if snapshot(self.reference) != snapshot(self.engine):
+                    lines.append('first differing instruction:')
+                    lines += ['  ' + text for text in history[-8:-1]]
+                    lines.append('> ' + history[-1])
+                    return '\n'.join(lines + differences(self.reference, self.engine))
+
+            lines.append('instructions of the block are equal when executed one by one')
+
+        # replay the whole block to show the differences
+        self.reference.load_state(states[0])
+        self.engine.load_state(states[1])
+        run_frame(self.reference, keys, [], block + 1)
+        run_frame(self.engine, keys, [], block + 1)
+        return '\n'.join(lines + differences(self.reference, self.engine))
+
+
+# engines that can be tested
+ENGINES = {
+    'fast': FastEngine,
+    'idioms': IdiomEngine,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - compare an execution engine with the reference interpreter')
+    parser.add_argument('rom', type=str, help='ROM file')
+    parser.add_argument('--engine', dest='engine', default='fast', choices=list(ENGINES), help='Engine to test')
+    parser.add_argument('--frames', dest='frames', default=600, type=int, help='Frames to compare')
+    parser.add_argument('--granularity', dest='granularity', default='block', choices=['block', 'frame'],
+                        help='Compare after every batch of instructions or only after every frame')
+    parser.add_argument('--movie', dest='movie', default=None, type=str, help='Input recorded with --record-movie')
+
+    args = parser.parse_args()
+
+    inputs = None
+    if args.movie:
+        from controls.movie import ReplayControls
+        inputs = ReplayControls(args.movie).movie
+
+    result = Lockstep(args.rom, ENGINES[args.engine], inputs).run(args.frames, args.granularity)
+    print(result or 'equal for {} frames'.format(args.frames))
+    raise SystemExit(1 if result else 0)
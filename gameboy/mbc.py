@@ -6,9 +6,16 @@ class MBC:
     ram_bank_number = 0  # 0x00-0x03 (2 bit)
     rom_ram_select = 0  # 1 bit
 
-    def __init__(self, path):
-        with open(path, 'rb') as file:
-            self.rom = bytearray(file.read())
+    def __init__(self, rom):
+        """
+        :param rom: path to rom file or its content
+        """
+
+        if isinstance(rom, (bytes, bytearray)):
+            self.rom = bytearray(rom)
+        else:
+            with open(rom, 'rb') as file:
+                self.rom = bytearray(file.read())
 
         self.title = self.rom[0x134:0x0143].decode('ascii')
         self.type = self.rom[0x147]
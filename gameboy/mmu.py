@@ -3,6 +3,7 @@
 import random
 
 from gameboy.mbc import MBC
+from gameboy.serial import Serial
 
 """
 General Memory Map
@@ -23,11 +24,21 @@ General Memory Map
 
 class MMU:
 
-    def __init__(self, gameboy, args):
+    def __init__(self, gameboy, rom):
         self.controls = gameboy.controls
-        self.mbc = MBC(args.rom)
+        self.mbc = MBC(rom)
+        self.ram = bytearray(0x10000)  # 0x0000-0xFFFF
 
-    ram = bytearray(0x10000)  # 0x0000-0xFFFF
+        # DIV is not emulated yet, reads return random values, seeded to be reproducible
+        self.random = random.Random(0)
+
+        # button states at the last check for the joypad interrupt
+        self.states = 0xFF
+
+        # sound registers are passed on if sound is emulated
+        self.apu = None
+        # without link cable by default
+        self.serial = Serial(gameboy)
 
     def load_rom(self, rom):
         """
@@ -41,7 +52,10 @@ class MMU:
 
     def read(self, addr):
         if addr == 0xFF04:
-            return random.randint(0, 0xFF)
+            return self.random.randint(0, 0xFF)
+
+        if addr == 0xFF00:
+            return self.joypad()
 
         if addr in range(0x7FFF):
             return self.mbc.read(addr)
@@ -58,23 +72,54 @@ class MMU:
             return
 
         if addr == 0xFF00:
-            # controls
-            buttons = value >> 5 & 1 == 0
-            directions = value >> 4 & 1 == 0
+            # controls, only the selection is writable, the lines are evaluated on read
+            value = 0xC0 | value & 0x30
 
-            if buttons and not directions:
-                value |= self.controls.states >> 4
-            elif directions and not buttons:
-                value |= self.controls.states & 0xF
-            else:
-                value |= 0xF
+        elif addr == 0xFF02:
+            self.serial.start(value)
 
         elif addr == 0xFF46:
             # LCD OAM DMA Transfer
             self.ram[0xFE00:0xFE9F] = self.ram[value << 8:(value << 8) | 0x9F]
 
+        elif 0xFF10 <= addr < 0xFF40 and self.apu:
+            self.apu.write(addr, value)
+
         self.ram[addr] = value
 
+    def joypad(self, states=None):
+        """
+        FF00 - P1/JOYP - Joypad (R/W)
+          Bit 5 - P15 Select Button Keys      (0=Select)
+          Bit 4 - P14 Select Direction Keys   (0=Select)
+          Bit 3 - P13 Input Down  or Start    (0=Pressed) (Read Only)
+          Bit 2 - P12 Input Up    or Select   (0=Pressed) (Read Only)
+          Bit 1 - P11 Input Left  or Button B (0=Pressed) (Read Only)
+          Bit 0 - P10 Input Right or Button A (0=Pressed) (Read Only)
+
+        :param states: button states, the latched ones of the controls by default
+        """
+
+        if states is None:
+            states = self.controls.states
+
+        value = self.ram[0xFF00] | 0xF
+        if not value & 0x20:
+            value &= 0xF0 | states >> 4
+        if not value & 0x10:
+            value &= 0xF0 | states & 0xF
+        return value
+
+    def check_joypad_interrupt(self):
+        """
+        Request the joypad interrupt when a selected input line went low since the last check, called once per frame
+        after the controls are latched
+        """
+
+        if self.joypad(self.states) & ~self.joypad() & 0xF:
+            self.set_interrupt(4)
+        self.states = self.controls.states
+
     def set_mode(self, mode):
         """
         FF41 - STAT - LCDC Status (R/W)
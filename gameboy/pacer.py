@@ -0,0 +1,76 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import statistics
+import time
+from collections import deque
+
+# 70224 clks per frame at 4.194304 MHz, ~59.73 Hz
+FRAME_TIME = 70224 / 4194304
+
+
+class Pacer:
+    """
+    Frame limiter for the main-loop. Sleeps for most of the remaining frame time and spins for the last part,
+    since sleep alone wakes up too late to hold the frame rate with low jitter.
+    """
+
+    # spin instead of sleep for the last 2ms of a frame
+    spin = 0.002
+
+    # don't try to catch up when falling behind more than that
+    max_lag = 4
+
+    def __init__(self, controls, speed=1.0):
+        if speed <= 0:
+            raise ValueError('speed must be greater than 0')
+
+        self.controls = controls
+        self.frame_time = FRAME_TIME / speed
+        self.deadline = self.last = time.perf_counter()
+        self.times = deque(maxlen=600)
+
+    def wait(self):
+        """
+        Wait until the current frame is due, called once after each frame
+        """
+
+        now = time.perf_counter()
+
+        if self.controls.turbo:
+            self.deadline = now
+        else:
+            self.deadline += self.frame_time
+
+            if now - self.deadline > self.max_lag * self.frame_time:
+                self.deadline = now
+
+            remaining = self.deadline - now
+            if remaining > self.spin:
+                time.sleep(remaining - self.spin)
+
+            while now < self.deadline:
+                now = time.perf_counter()
+
+        self.times.append(now - self.last)
+        self.last = now
+
+    def behind(self):
+        """
+        :return: True if the current frame is already late, always in turbo mode
+        """
+        return self.controls.turbo or time.perf_counter() > self.deadline + self.frame_time
+
+    def stats(self):
+        """
+        Frame time statistics over the last frames in ms, max_dev is the largest deviation from the target frame time
+        """
+
+        if len(self.times) < 2:
+            return {'mean': 0, 'jitter': 0, 'max_dev': 0}
+
+        mean = statistics.fmean(self.times)
+        return {
+            'mean': mean * 1000,
+            'jitter': statistics.pstdev(self.times, mean) * 1000,
+            'max_dev': max(abs(t - self.frame_time) for t in self.times) * 1000
+        }
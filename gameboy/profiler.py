@@ -0,0 +1,127 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import json
+import time
+
+from instructions.instructions import Instructions
+
+
+class Profiler:
+    """
+    Counts executions and host time per opcode (CB-prefixed ones separately), per PC and per ROM bank. The profiled
+    next_instruction is swapped into the CPU by install(), so the CPU doesn't pay anything while not profiling.
+    """
+
+    def __init__(self, cpu):
+        self.cpu = cpu
+        self.inner = cpu.next_instruction
+        # index 0x000-0x0FF opcodes, 0x100-0x1FF CB opcodes
+        self.counts = [0] * 0x200
+        self.times = [0] * 0x200
+        # bank << 16 | pc -> [count, time]
+        self.pcs = {}
+
+    def install(self):
+        # chained to an already installed next_instruction, e.g. profiling and tracing at once
+        self.inner = self.cpu.next_instruction
+        self.cpu.next_instruction = self.next_instruction
+
+    def uninstall(self):
+        del self.cpu.next_instruction
+        if getattr(self.inner, '__self__', None) is not self.cpu:
+            self.cpu.next_instruction = self.inner
+
+    def next_instruction(self):
+        cpu = self.cpu
+        mmu = cpu.mmu
+
+        # interrupts change the PC, check them before looking at the instruction
+        cpu.check_interrupt()
+
+        pc = cpu.PC
+        op = mmu.read(pc)
+        if op == 0xCB:
+            op = 0x100 | mmu.read(pc + 1 & 0xFFFF)
+
+        start = time.perf_counter_ns()
+        cycles = self.inner()
+        elapsed = time.perf_counter_ns() - start
+
+        self.counts[op] += 1
+        self.times[op] += elapsed
+
+        key = mmu.mbc.rom_bank_number << 16 | pc if 0x4000 <= pc < 0x8000 else pc
+        stats = self.pcs.get(key)
+        if stats is None:
+            self.pcs[key] = [1, elapsed]
+        else:
+            stats[0] += 1
+            stats[1] += elapsed
+
+        return cycles
+
+    def results(self):
+        """
+        :return: opcodes, PCs and banks, each sorted by time
+        """
+
+        names, cb = Instructions().build_names()
+
+        opcodes = [{'opcode': '{:02X}'.format(op) if op < 0x100 else 'CB {:02X}'.format(op & 0xFF),
+                    'name': names.get(op, '-') if op < 0x100 else cb[op & 0xFF],
+                    'count': self.counts[op], 'time': self.times[op]}
+                   for op in range(0x200) if self.counts[op]]
+
+        pcs, banks = [], {}
+        for key, (count, elapsed) in self.pcs.items():
+            bank, pc = key >> 16, key & 0xFFFF
+            pcs.append({'bank': bank, 'pc': pc, 'count': count, 'time': elapsed})
+            total = banks.setdefault(bank, {'bank': bank, 'count': 0, 'time': 0})
+            total['count'] += count
+            total['time'] += elapsed
+
+        def by_time(entries):
+            return sorted(entries, key=lambda entry: entry['time'], reverse=True)
+
+        return {'opcodes': by_time(opcodes), 'pcs': by_time(pcs), 'banks': by_time(banks.values())}
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.results(), file, indent=1)
+
+
+def report(results, limit=20):
+    """
+    :return: text report of the results, limited to the top entries
+    """
+
+    total = sum(entry['time'] for entry in results['opcodes']) or 1
+    lines = ['{:>8} {:16} {:>12} {:>10} {:>7}'.format('opcode', 'name', 'count', 'time ms', 'time %')]
+
+    for entry in results['opcodes'][:limit]:
+        lines.append('{:>8} {:16} {:12} {:10.1f} {:7.1%}'.format(
+            entry['opcode'], entry['name'], entry['count'], entry['time'] / 1e6, entry['time'] / total))
+
+    lines += ['', '{:>8} {:>16} {:>12} {:>10} {:>7}'.format('bank', 'pc', 'count', 'time ms', 'time %')]
+    for entry in results['pcs'][:limit]:
+        lines.append('{:8} {:>16} {:12} {:10.1f} {:7.1%}'.format(
+            entry['bank'], '{:04X}'.format(entry['pc']), entry['count'], entry['time'] / 1e6, entry['time'] / total))
+
+    lines += ['', '{:>8} {:>16} {:>12} {:>10} {:>7}'.format('bank', '', 'count', 'time ms', 'time %')]
+    for entry in results['banks']:
+        lines.append('{:8} {:>16} {:12} {:10.1f} {:7.1%}'.format(
+            entry['bank'], '', entry['count'], entry['time'] / 1e6, entry['time'] / total))
+
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - show profile')
+    parser.add_argument('profile', type=str, help='Profile written with --profile')
+    parser.add_argument('--limit', dest='limit', default=20, type=int, help='Number of opcodes and PCs to show')
+
+    args = parser.parse_args()
+
+    with open(args.profile) as file:
+        print(report(json.load(file), args.limit))
@@ -0,0 +1,108 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import zlib
+from collections import deque
+
+from gameboy import state
+
+
+class Rewind:
+    """
+    Bounded ring buffer of save states for rewinding. Every n-th state is kept as compressed keyframe, the others as
+    compressed XOR delta against the previous keyframe, which is mostly zeros and compresses well. The oldest
+    entries are evicted one by one as soon as the buffer holds more frames than requested or exceeds its memory limit.
+    An evicted keyframe is kept as base of its remaining deltas, the memory limit can be exceeded by this one keyframe.
+    """
+
+    # fps of the gameboy
+    fps = 60
+
+    def __init__(self, gameboy, seconds=10, max_bytes=64 << 20, keyframes=60, level=1):
+        self.gameboy = gameboy
+        self.max_frames = int(seconds * self.fps)
+        self.max_bytes = max_bytes
+        self.keyframes = keyframes
+        self.level = level
+
+        # (keyframe, compressed state or delta)
+        self.entries = deque()
+        self.size = 0
+        # compressed keyframe evicted before its deltas
+        self.base = None
+        self.since_key = 0
+        self.key = 0
+
+    def push(self):
+        """
+        Store the current state, called after each frame
+        """
+
+        data = int.from_bytes(state.save(self.gameboy), 'little')
+
+        if not self.entries or self.since_key >= self.keyframes:
+            self.key = data
+            self.since_key = 0
+            self.append(True, data)
+        else:
+            self.since_key += 1
+            self.append(False, data ^ self.key)
+
+        while self.entries and (len(self.entries) > self.max_frames or self.size > self.max_bytes):
+            self.evict()
+
+    def append(self, keyframe, data):
+        data = zlib.compress(data.to_bytes(state.SIZE, 'little'), self.level)
+        self.entries.append((keyframe, data))
+        self.size += len(data)
+
+    def evict(self):
+        keyframe, data = self.entries.popleft()
+        self.size -= len(data)
+
+        if keyframe:
+            # the deltas following it still need it
+            self.base = data
+        if not self.entries or self.entries[0][0]:
+            self.base = None
+
+    def rewind(self):
+        """
+        Go back to the latest stored state and drop it from the buffer
+        :return: False if there is nothing to rewind
+        """
+
+        if not self.entries:
+            return False
+
+        keyframe, data = self.entries.pop()
+        self.size -= len(data)
+        data = int.from_bytes(zlib.decompress(data), 'little')
+
+        if keyframe:
+            current = data
+            self.find_key()
+        else:
+            current = data ^ self.key
+            self.since_key -= 1
+            if not self.entries:
+                self.base = None
+
+        state.load(self.gameboy, current.to_bytes(state.SIZE, 'little'))
+        return True
+
+    def find_key(self):
+        """
+        Restore the previous keyframe after the latest one was rewound
+        """
+
+        self.key, self.since_key = 0, 0
+
+        for keyframe, data in reversed(self.entries):
+            if keyframe:
+                break
+            self.since_key += 1
+        else:
+            data = self.base
+
+        if data is not None:
+            self.key = int.from_bytes(zlib.decompress(data), 'little')
@@ -0,0 +1,140 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import os
+import socket
+import struct
+import sys
+
+"""
+Serial Data Transfer (Link Cable)
+  FF01 - SB - Serial transfer data (R/W)
+  FF02 - SC - Serial Transfer Control (R/W)
+    Bit 7 - Transfer Start Flag (0=No transfer is in progress or requested, 1=Transfer in progress, or requested)
+    Bit 0 - Shift Clock (0=External Clock, 1=Internal Clock)
+
+A transfer with internal clock takes 8 bits at 8192 Hz, 4096 cycles, then SB holds the received byte, bit 7 of SC is
+cleared and the serial interrupt is requested. Without a cable connected the received byte is 0xFF.
+
+Two instances are linked over a Unix domain socket and exchange SB and SC once per frame:
+  u8  SB
+  u8  SC
+The transfer of the instance with internal clock completes at this point, with the partner as receiver if it waits
+for a transfer with external clock. So at most one byte is transferred per frame and direction.
+"""
+
+LINK = struct.Struct('<BB')
+
+# no transfer pending
+NEVER = float('inf')
+
+
+def connect(path):
+    """
+    Connect to the instance listening at the path, or listen and wait for the other instance if there is none
+    :return: connected socket
+    """
+
+    link = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        link.connect(path)
+        return link
+    except (FileNotFoundError, ConnectionRefusedError):
+        pass
+
+    if os.path.exists(path):
+        os.remove(path)
+    link.bind(path)
+    link.listen(1)
+    connection, _ = link.accept()
+    link.close()
+    os.remove(path)
+    return connection
+
+
+class Serial:
+
+    def __init__(self, gameboy, link=None, output=None):
+        """
+        :param link: socket connected to the other instance
+        :param output: file the sent bytes are written to, - for stdout
+        """
+
+        self.gameboy = gameboy
+        self.link = link
+        # all bytes sent, test ROMs report their results this way
+        self.output = bytearray()
+        self.file = None
+        if output:
+            self.file = sys.stdout.buffer if output == '-' else open(output, 'wb')
+
+        # cycle the transfer with internal clock completes at
+        self.due = NEVER
+
+    def start(self, value):
+        """
+        Write to SC
+        """
+
+        if value & 0x81 != 0x81:
+            return
+
+        data = self.gameboy.mmu.ram[0xFF01]
+        self.output.append(data)
+        if self.file:
+            self.file.write(bytes([data]))
+            self.file.flush()
+
+        if not self.link:
+            self.due = self.gameboy.cpu.cycles + 4096
+
+    def complete(self, data=0xFF):
+        """
+        Finish a transfer, called by the CPU once the cycle of the transfer is reached
+        """
+
+        mmu = self.gameboy.mmu
+        mmu.ram[0xFF01] = data
+        mmu.ram[0xFF02] &= 0x7F
+        mmu.set_interrupt(3)
+        self.due = NEVER
+
+    def sync(self):
+        """
+        Exchange SB and SC with the linked instance, called after every frame
+        """
+
+        if not self.link:
+            return
+
+        ram = self.gameboy.mmu.ram
+        data, control = ram[0xFF01], ram[0xFF02]
+
+        try:
+            self.link.sendall(LINK.pack(data, control))
+            message = b''
+            while len(message) < LINK.size:
+                chunk = self.link.recv(LINK.size - len(message))
+                if not chunk:
+                    raise ConnectionError('link closed')
+                message += chunk
+        except OSError:
+            # the other instance is gone, continue without cable
+            self.link.close()
+            self.link = None
+            if control & 0x81 == 0x81:
+                self.due = self.gameboy.cpu.cycles
+            return
+
+        other_data, other_control = LINK.unpack(message)
+
+        if control & 0x81 == 0x81:
+            self.complete(other_data if other_control & 0x81 == 0x80 else 0xFF)
+        if other_control & 0x81 == 0x81 and control & 0x81 == 0x80:
+            self.complete(other_data)
+
+    def close(self):
+        if self.link:
+            self.link.close()
+            self.link = None
+        if self.file and self.file is not sys.stdout.buffer:
+            self.file.close()
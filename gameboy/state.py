@@ -0,0 +1,79 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import struct
+
+from gameboy.serial import NEVER
+
+"""
+Save state format, all values little endian
+  'CYBS'  magic
+  u16     format version
+  CPU     registers B, C, D, E, H, L, A, F, SP, PC, IME and halted
+  MBC     ROM bank number, RAM bank number, ROM/RAM mode select
+  MMU     state of the random generator that replaces DIV
+  Serial  cycles until the running transfer completes, -1 if there is none
+  64KB    memory 0x0000-0xFFFF, includes VRAM, external (cartridge) RAM, WRAM, OAM, I/O registers and HRAM
+
+States are taken in between two frames, so the PPU always starts over with the next frame at line 0. LY, STAT and
+all other LCD registers are part of the I/O memory.
+"""
+
+MAGIC = b'CYBS'
+VERSION = 4
+
+HEADER = struct.Struct('<4sH')
+CPU_STATE = struct.Struct('<8BHH??')
+MBC_STATE = struct.Struct('<BBB')
+RANDOM_STATE = struct.Struct('<625I')
+SERIAL_STATE = struct.Struct('<i')
+SIZE = HEADER.size + CPU_STATE.size + MBC_STATE.size + RANDOM_STATE.size + SERIAL_STATE.size + 0x10000
+
+
+def save(gameboy):
+    """
+    :return: state as bytes
+    """
+
+    cpu, mbc, serial = gameboy.cpu, gameboy.mmu.mbc, gameboy.mmu.serial
+    _, random_state, _ = gameboy.mmu.random.getstate()
+
+    return b''.join((
+        HEADER.pack(MAGIC, VERSION),
+        CPU_STATE.pack(cpu.B, cpu.C, cpu.D, cpu.E, cpu.H, cpu.L, cpu.A, cpu.F, cpu.SP, cpu.PC, cpu.ime,
+                       cpu.halted),
+        MBC_STATE.pack(mbc.rom_bank_number, mbc.ram_bank_number, mbc.rom_ram_select),
+        RANDOM_STATE.pack(*random_state),
+        SERIAL_STATE.pack(serial.due - cpu.cycles if serial.due != NEVER else -1),
+        gameboy.mmu.ram
+    ))
+
+
+def load(gameboy, state):
+    """
+    Restore a state created by save()
+    """
+
+    magic, version = HEADER.unpack_from(state)
+    if magic != MAGIC:
+        raise ValueError('not a save state')
+    if version != VERSION or len(state) != SIZE:
+        raise ValueError('unsupported save state version {}'.format(version))
+
+    cpu, mbc = gameboy.cpu, gameboy.mmu.mbc
+    offset = HEADER.size
+
+    cpu.B, cpu.C, cpu.D, cpu.E, cpu.H, cpu.L, cpu.A, cpu.F, cpu.SP, cpu.PC, cpu.ime, cpu.halted = \
+        CPU_STATE.unpack_from(state, offset)
+    offset += CPU_STATE.size
+
+    mbc.rom_bank_number, mbc.ram_bank_number, mbc.rom_ram_select = MBC_STATE.unpack_from(state, offset)
+    offset += MBC_STATE.size
+
+    gameboy.mmu.random.setstate((3, RANDOM_STATE.unpack_from(state, offset), None))
+    offset += RANDOM_STATE.size
+
+    due, = SERIAL_STATE.unpack_from(state, offset)
+    gameboy.mmu.serial.due = cpu.cycles + due if due >= 0 else NEVER
+    offset += SERIAL_STATE.size
+
+    gameboy.mmu.ram[:] = memoryview(state)[offset:]
@@ -0,0 +1,173 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import struct
+
+from instructions.assembler import IMMEDIATES
+from instructions.instructions import Instructions
+
+"""
+Trace file format, all values little endian
+  'CYBT'  magic
+  u16     format version
+  u64     number of records
+  records in order of execution:
+    u16   PC
+    u16   opcode, 0x100 | opcode for CB-prefixed ones
+    u16   the two bytes following the opcode
+    u8    B, C, D, E, H, L, A, F before execution
+    u16   SP
+    u64   cycle count before execution
+"""
+
+MAGIC = b'CYBT'
+VERSION = 1
+HEADER = struct.Struct('<4sHQ')
+RECORD = struct.Struct('<HHH8BHQ')
+FIELDS = ['pc', 'opcode', 'operands', 'B', 'C', 'D', 'E', 'H', 'L', 'A', 'F', 'SP', 'cycle']
+
+
+class Tracer:
+    """
+    Records every executed instruction into a preallocated ring buffer, nothing is written to disk unless dump() is
+    called. Like the profiler, the tracing next_instruction is swapped into the CPU by install().
+    """
+
+    def __init__(self, cpu, size=1 << 20):
+        """
+        :param size: number of instructions kept
+        """
+
+        self.cpu = cpu
+        self.inner = cpu.next_instruction
+        self.size = size
+        self.buffer = bytearray(RECORD.size * size)
+        self.count = 0
+        self.cycle = 0
+
+    def install(self):
+        # chained to an already installed next_instruction, e.g. profiling and tracing at once
+        self.inner = self.cpu.next_instruction
+        self.cpu.next_instruction = self.next_instruction
+
+    def uninstall(self):
+        del self.cpu.next_instruction
+        if getattr(self.inner, '__self__', None) is not self.cpu:
+            self.cpu.next_instruction = self.inner
+
+    def next_instruction(self):
+        cpu = self.cpu
+        read = cpu.mmu.read
+
+        cpu.check_interrupt()
+
+        pc = cpu.PC
+        op = read(pc)
+        operands = read(pc + 1 & 0xFFFF) | read(pc + 2 & 0xFFFF) << 8
+        if op == 0xCB:
+            op = 0x100 | operands & 0xFF
+            operands >>= 8
+
+        RECORD.pack_into(self.buffer, self.count % self.size * RECORD.size, pc, op, operands,
+                         cpu.B, cpu.C, cpu.D, cpu.E, cpu.H, cpu.L, cpu.A, cpu.F, cpu.SP, self.cycle)
+        # counted before executing, a crash dump ends with the faulting instruction
+        self.count += 1
+
+        cycles = self.inner()
+        self.cycle += cycles
+        return cycles
+
+    def dump(self, path):
+        """
+        Write the recorded instructions, oldest first
+        """
+
+        count = min(self.count, self.size)
+        split = self.count % self.size * RECORD.size if self.count > self.size else 0
+
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, count))
+            file.write(memoryview(self.buffer)[split:count * RECORD.size])
+            file.write(memoryview(self.buffer)[:split])
+
+
+def read(path):
+    """
+    :return: list of records as dicts
+    """
+
+    with open(path, 'rb') as file:
+        data = file.read()
+
+    magic, version, count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('{} is not a supported trace file'.format(path))
+
+    return [dict(zip(FIELDS, record)) for record in RECORD.iter_unpack(data[HEADER.size:])]
+
+
+names, cb_names = Instructions().build_names()
+
+
+def disassemble(pc, op, operands):
+    """
+    :return: instruction as text, e.g. JR NZ,$0150
+    """
+
+    if op & 0x100:
+        return cb_names[op & 0xFF]
+
+    name = names.get(op, 'DB ${:02X}'.format(op))
+    for template, size in IMMEDIATES.items():
+        if template in name:
+            value = operands & (0xFF if size == 1 else 0xFFFF)
+            if name.startswith('JR'):
+                value = pc + 2 + ((value ^ 0x80) - 0x80) & 0xFFFF
+                text = '${:04X}'.format(value)
+            else:
+                text = '${:0{}X}'.format(value, size * 2)
+            return name.replace(template, text)
+
+    return name
+
+
+def format_record(record):
+    return '{cycle:12} {pc:04X}  {text:20} A={A:02X} F={F:02X} B={B:02X} C={C:02X} D={D:02X} E={E:02X} ' \
+           'H={H:02X} L={L:02X} SP={SP:04X}'.format(text=disassemble(record['pc'], record['opcode'],
+                                                                     record['operands']), **record)
+
+
+def diff(first, second, context=5):
+    """
+    :return: text around the first differing record of two traces, None if they are equal
+    """
+
+    for i, (a, b) in enumerate(zip(first, second)):
+        if a != b:
+            fields = [field for field in FIELDS if a[field] != b[field]]
+            lines = [format_record(record) for record in first[max(0, i - context):i]]
+            lines += ['- ' + format_record(a), '+ ' + format_record(b),
+                      'record {} differs in {}'.format(i, ', '.join(fields))]
+            return '\n'.join(lines)
+
+    if len(first) != len(second):
+        return 'traces differ in length, {} and {} records'.format(len(first), len(second))
+
+    return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - decode and compare instruction traces')
+    parser.add_argument('trace', type=str, help='Trace file written with --trace')
+    parser.add_argument('other', type=str, nargs='?', help='Second trace to compare with')
+    parser.add_argument('--last', dest='last', default=None, type=int, help='Only show the last N instructions')
+
+    args = parser.parse_args()
+
+    if args.other:
+        result = diff(read(args.trace), read(args.other))
+        print(result or 'traces are equal')
+    else:
+        records = read(args.trace)
+        for record in records[-args.last if args.last else 0:]:
+            print(format_record(record))
@@ -0,0 +1,181 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import atexit
+import multiprocessing
+import os
+import traceback
+from multiprocessing import shared_memory
+
+from display.display import WIDTH, HEIGHT
+from gameboy.emulator import Emulator
+
+SIZE = WIDTH * HEIGHT
+
+"""
+Shared memory layout for n emulators
+  n bytes      buttons of each emulator, bit set while pressed
+  n * 23040    last frame of each emulator, see Emulator.get_frame
+"""
+
+
+class VecEnv:
+    """
+    Hosts n headless emulators in a pool of worker processes, which step all their emulators for every call of
+    step(). Buttons and frames are exchanged through shared memory, the pipes to the workers only carry commands.
+
+        env = VecEnv('tetris.gb', 16)
+        frames = numpy.frombuffer(env.step(actions, frames=4), numpy.uint8).reshape(16, 144, 160)
+    """
+
+    def __init__(self, rom, n, workers=None):
+        """
+        :param rom: path to rom file or its content
+        :param n: number of emulators
+        :param workers: number of worker processes, one per cpu by default
+        """
+
+        if not isinstance(rom, (bytes, bytearray)):
+            with open(rom, 'rb') as file:
+                rom = file.read()
+
+        self.n = n
+        self.shm = shared_memory.SharedMemory(create=True, size=n + n * SIZE)
+        self.actions = self.shm.buf[:n]
+        self.observations = self.shm.buf[n:n + n * SIZE]
+
+        workers = min(workers or os.cpu_count(), n)
+        self.pipes, self.processes = [], []
+
+        for i in range(workers):
+            pipe, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=work, args=(child, self.shm.name, n, rom,
+                                                                 n * i // workers, n * (i + 1) // workers))
+            process.daemon = True
+            process.start()
+            self.pipes.append(pipe)
+            self.processes.append(process)
+
+        try:
+            self.wait()
+        except Exception:
+            self.close()
+            raise
+        atexit.register(self.close)
+
+    def command(self, *command):
+        for pipe in self.pipes:
+            try:
+                pipe.send(command)
+            except OSError:
+                # worker is gone, reported by wait()
+                pass
+        self.wait()
+
+    def wait(self):
+        """
+        Wait for all workers, raises the first exception a worker reported
+        """
+
+        errors = []
+        for i, pipe in enumerate(self.pipes):
+            try:
+                result = pipe.recv()
+            except EOFError:
+                result = RuntimeError('worker {} died'.format(i))
+            if isinstance(result, Exception):
+                errors.append(result)
+
+        if errors:
+            raise errors[0]
+
+    def step(self, actions=None, frames=1):
+        """
+        Step all emulators
+        :param actions: buttons of each emulator, None to keep the previous ones
+        :return: memoryview of the frames of all emulators
+        """
+
+        if actions is not None:
+            self.actions[:] = bytes(actions)
+
+        self.command('step', frames)
+        return self.observations
+
+    def observation(self, i):
+        return self.observations[i * SIZE:(i + 1) * SIZE]
+
+    def reset(self):
+        """
+        Reset all emulators to power-on
+        :return: memoryview of the frames of all emulators, blank as nothing is drawn yet
+        """
+        self.command('reset', None)
+        return self.observations
+
+    def close(self):
+        atexit.unregister(self.close)
+
+        try:
+            for pipe in self.pipes:
+                try:
+                    pipe.send(('close', None))
+                except OSError:
+                    # worker already gone
+                    pass
+            for process in self.processes:
+                process.join(1)
+                if process.is_alive():
+                    process.terminate()
+        finally:
+            self.actions.release()
+            self.observations.release()
+            try:
+                self.shm.close()
+            except BufferError:
+                # frames returned by step() are still referenced, the memory is freed with them
+                pass
+            self.shm.unlink()
+
+
+def work(pipe, name, n, rom, start, stop):
+    """
+    Main-loop of a worker process, runs emulators start to stop
+    """
+
+    shm = shared_memory.SharedMemory(name=name)
+    actions = shm.buf[:n]
+    observations = shm.buf[n:n + n * SIZE]
+
+    try:
+        emulators = [Emulator(rom) for _ in range(start, stop)]
+    except Exception as e:
+        emulators = None
+        pipe.send(RuntimeError(''.join(traceback.format_exception(e))))
+    else:
+        pipe.send(None)
+
+    while emulators is not None:
+        command, arg = pipe.recv()
+
+        if command == 'close':
+            break
+
+        # exceptions are sent to the parent, which raises them with the traceback of the worker
+        try:
+            for i, emulator in enumerate(emulators, start):
+                if command == 'step':
+                    emulator.step(arg, actions[i])
+                elif command == 'reset':
+                    emulator.reset()
+                    # the screenbuffer isn't part of the state, the frame before the reset would be returned
+                    emulator.display.screenbuffer[:] = bytes(SIZE)
+
+                observations[i * SIZE:(i + 1) * SIZE] = emulator.display.screenbuffer
+        except Exception as e:
+            pipe.send(RuntimeError(''.join(traceback.format_exception(e))))
+        else:
+            pipe.send(None)
+
+    actions.release()
+    observations.release()
+    shm.close()
@@ -0,0 +1,311 @@
+#  SPDX-License-Identifier: GPL-3.0-only
+
+import argparse
+import re
+
+from instructions.instructions import Instructions
+
+"""
+Minimal LR35902 assembler, the instruction encodings are taken from Instructions.build_names.
+
+Syntax, one statement per line, comments start with ;
+  label:              define label at the current address
+  LD A,$FF            instruction, numbers as $FF, 0xFF, %1010 or decimal, labels and + - in expressions
+  NAME = $C000        define a constant
+  ORG $150            continue at address
+  BANK 2              place the following code in ROM bank 2, which is mapped at $4000-$7FFF
+  DB 1,2,"text"       bytes
+  DW label            16 bit words, little endian
+  DS 16               16 zero bytes
+
+A cartridge image is filled up with the header at $0100-$014F: entry point (unless defined by the code), logo,
+title, cartridge type, ROM and RAM size and both checksums.
+"""
+
+LOGO = bytes([
+    0xCE, 0xED, 0x66, 0x66, 0xCC, 0x0D, 0x00, 0x0B, 0x03, 0x73, 0x00, 0x83, 0x00, 0x0C, 0x00, 0x0D,
+    0x00, 0x08, 0x11, 0x1F, 0x88, 0x89, 0x00, 0x0E, 0xDC, 0xCC, 0x6E, 0xE6, 0xDD, 0xDD, 0xD9, 0x99,
+    0xBB, 0xBB, 0x67, 0x63, 0x6E, 0x0E, 0xEC, 0xCC, 0xDD, 0xDC, 0x99, 0x9F, 0xBB, 0xB9, 0x33, 0x3E
+])
+
+# immediate operands and their size in bytes
+IMMEDIATES = {'d8': 1, 'a8': 1, 'r8': 1, 'd16': 2, 'a16': 2}
+
+
+class AssemblerError(Exception):
+
+    def __init__(self, line, message):
+        super().__init__('line {}: {}'.format(line, message))
+
+
+def operand_kind(template):
+    """
+    Kind of an operand in a mnemonic template: 'imm', 'mem', 'sp' for immediates, None for literals
+    """
+
+    if template in IMMEDIATES:
+        return 'imm'
+    if template in ('(a8)', '(a16)'):
+        return 'mem'
+    if template == 'SP+r8':
+        return 'sp'
+    return None
+
+
+def build_table():
+    """
+    :return: mnemonic -> [(operands, opcode bytes, immediate template)]
+    """
+
+    table = {}
+    names, cb = Instructions().build_names()
+    entries = [(name, bytes([op])) for op, name in names.items() if op != 0xCB] + \
+              [(name, bytes([0xCB, op])) for op, name in cb.items()]
+
+    for name, code in entries:
+        mnemonic, _, operands = name.partition(' ')
+        operands = operands.split(',') if operands else []
+
+        if mnemonic == 'RST':
+            operands = [operands[0][:-1]]
+
+        immediate = None
+        for operand in operands:
+            for template in IMMEDIATES:
+                if template in operand:
+                    immediate = template
+
+        table.setdefault(mnemonic, []).append((operands, code, immediate))
+
+    return table
+
+
+class Assembler:
+    table = build_table()
+
+    literals = {'A', 'B', 'C', 'D', 'E', 'H', 'L', 'AF', 'BC', 'DE', 'HL', 'SP', 'NZ', 'Z', 'NC',
+                '(HL)', '(BC)', '(DE)', '(C)', '(HL+)', '(HL-)', '(HLI)', '(HLD)'}
+
+    aliases = {'(HLI)': '(HL+)', '(HLD)': '(HL-)'}
+
+    def __init__(self):
+        self.symbols = {}
+        # in the first pass symbols may be used before they are defined
+        self.final = False
+
+    def value(self, expr, line):
+        """
+        Evaluate an expression of numbers and symbols joined by + and -
+        """
+
+        total = 0
+        for sign, term in re.findall(r'([+-]?)\s*([^+\-\s]+)', expr):
+            if term.startswith('$'):
+                number = int(term[1:], 16)
+            elif term.startswith('%'):
+                number = int(term[1:], 2)
+            elif term[0].isdigit():
+                number = int(term, 0)
+            elif term in self.symbols:
+                number = self.symbols[term]
+            elif not self.final:
+                number = 0
+            else:
+                raise AssemblerError(line, 'unknown symbol {}'.format(term))
+
+            total += -number if sign == '-' else number
+
+        return total
+
+    def match(self, mnemonic, operands, line):
+        """
+        Find the encoding of an instruction
+        :return: opcode bytes, immediate template, immediate expression
+        """
+
+        if mnemonic == 'RST':
+            operands = ['{:02X}'.format(self.value(operands[0], line))]
+
+        for templates, code, immediate in self.table.get(mnemonic, []):
+            if len(templates) != len(operands):
+                continue
+
+            expr = None
+            for template, operand in zip(templates, operands):
+                kind = operand_kind(template)
+                upper = operand.upper().replace(' ', '')
+
+                if kind is None:
+                    if self.aliases.get(upper, upper) != template:
+                        break
+                elif kind == 'mem':
+                    if not operand.startswith('(') or upper in self.literals:
+                        break
+                    expr = operand[1:-1]
+                elif kind == 'sp':
+                    if not upper.startswith(('SP+', 'SP-')):
+                        break
+                    expr = operand[2:]
+                else:
+                    if operand.startswith('(') or upper in self.literals:
+                        break
+                    expr = operand
+            else:
+                return code, immediate, expr
+
+        raise AssemblerError(line, 'unknown instruction {} {}'.format(mnemonic, ','.join(operands)))
+
+    def parse(self, source):
+        """
+        :return: statements as (line, label, keyword, operands)
+        """
+
+        statements = []
+        for number, text in enumerate(source.splitlines(), 1):
+            text = text.split(';')[0].strip()
+
+            label = None
+            match = re.match(r'^([A-Za-z_.][\w.]*):\s*(.*)$', text)
+            if match:
+                label, text = match.groups()
+
+            match = re.match(r'^([A-Za-z_.][\w.]*)\s*=\s*(.+)$', text)
+            if match:
+                statements.append((number, label, '=', list(match.groups())))
+                continue
+
+            keyword, _, rest = text.partition(' ')
+            operands = [operand.strip() for operand in re.findall(r'"[^"]*"|[^,]+', rest) if operand.strip()]
+            statements.append((number, label, keyword.upper(), operands))
+
+        return statements
+
+    def assemble(self, source, size=0x8000):
+        """
+        :return: ROM image of the given size
+        """
+
+        statements = self.parse(source)
+        rom = bytearray(size)
+
+        # the first pass only collects the addresses of the labels
+        for self.final in (False, True):
+            addr, bank = 0, 0
+
+            for line, label, keyword, operands in statements:
+                if label:
+                    self.symbols[label] = addr
+
+                if keyword == '=':
+                    self.symbols[operands[0]] = self.value(operands[1], line)
+                elif keyword == 'ORG':
+                    addr = self.value(operands[0], line)
+                elif keyword == 'BANK':
+                    bank = self.value(operands[0], line)
+                    addr = 0x4000
+                else:
+                    data = self.statement(keyword, operands, addr, line)
+
+                    offset = addr + (bank - 1) * 0x4000 if bank and addr >= 0x4000 else addr
+                    if offset + len(data) > size:
+                        raise AssemblerError(line, 'code exceeds ROM size')
+
+                    rom[offset:offset + len(data)] = data
+                    addr += len(data)
+
+        return rom
+
+    def statement(self, keyword, operands, addr, line):
+        """
+        :return: bytes of an instruction or data statement
+        """
+
+        if not keyword:
+            return b''
+
+        if keyword == 'DB':
+            data = bytearray()
+            for operand in operands:
+                if operand.startswith('"'):
+                    data += operand[1:-1].encode('ascii')
+                else:
+                    data.append(self.value(operand, line) & 0xFF)
+            return data
+
+        if keyword == 'DW':
+            return b''.join((self.value(operand, line) & 0xFFFF).to_bytes(2, 'little') for operand in operands)
+
+        if keyword == 'DS':
+            return bytes(self.value(operands[0], line))
+
+        code, immediate, expr = self.match(keyword, operands, line)
+        if immediate is None:
+            return code
+
+        size = IMMEDIATES[immediate]
+        value = self.value(expr, line)
+
+        if keyword == 'JR':
+            value -= addr + len(code) + size
+            if self.final and not -128 <= value <= 127:
+                raise AssemblerError(line, 'jump target out of range')
+        elif immediate == 'a8' and value >= 0xFF00:
+            value -= 0xFF00
+
+        return code + (value & (1 << size * 8) - 1).to_bytes(size, 'little')
+
+
+def header(rom, title='', cartridge_type=0, ram_size=0):
+    """
+    Fill in the cartridge header of a ROM image, at least 2 banks of 16KB
+    """
+
+    if len(rom) < 0x8000:
+        raise ValueError('ROM must have at least 2 banks of 16KB, has {} bytes'.format(len(rom)))
+
+    if not any(rom[0x100:0x104]):
+        # NOP; JP $0150
+        rom[0x100:0x104] = bytes([0x00, 0xC3, 0x50, 0x01])
+
+    rom[0x104:0x134] = LOGO
+    rom[0x134:0x144] = title.encode('ascii')[:16].ljust(16, b'\0')
+    rom[0x147] = cartridge_type
+    rom[0x148] = (len(rom) // 0x8000).bit_length() - 1
+    rom[0x149] = ram_size
+
+    checksum = 0
+    for value in rom[0x134:0x14D]:
+        checksum = checksum - value - 1
+    rom[0x14D] = checksum & 0xFF
+
+    rom[0x14E:0x150] = b'\0\0'
+    rom[0x14E:0x150] = (sum(rom) & 0xFFFF).to_bytes(2, 'big')
+
+    return rom
+
+
+def cartridge(source, title='', cartridge_type=0, banks=2, ram_size=0):
+    """
+    Assemble source into a cartridge image with header
+    :param banks: number of 16KB ROM banks, at least 2
+    """
+    return header(Assembler().assemble(source, banks * 0x4000), title, cartridge_type, ram_size)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='CyBoy - LR35902 assembler')
+    parser.add_argument('source', type=str, help='Assembly source file')
+    parser.add_argument('output', type=str, help='ROM file')
+    parser.add_argument('--title', dest='title', default='', type=str, help='Cartridge title')
+    parser.add_argument('--type', dest='type', default=0, type=int, help='Cartridge type, 1 for MBC1')
+    parser.add_argument('--banks', dest='banks', default=2, type=int, help='Number of 16KB ROM banks')
+
+    args = parser.parse_args()
+    if args.banks < 2:
+        parser.error('--banks must be at least 2')
+
+    with open(args.source) as file:
+        rom = cartridge(file.read(), args.title, args.type, args.banks)
+
+    with open(args.output, 'wb') as file:
+        file.write(rom)
@@ -1,5 +1,10 @@
 #  SPDX-License-Identifier: GPL-3.0-only
 
+import hashlib
+import importlib
+import marshal
+import os
+import sys
 import types
 
 from instructions.cb import *
@@ -58,21 +63,60 @@ class Instructions:
 
     cb = {}
 
+    # mnemonics of the opcodes above, all others are named by build_ops
+    names = {
+        0x0: 'NOP',
+        0x7: 'RLCA',
+        0x8: 'LD (a16),SP',
+        0xf: 'RRCA',
+        0x10: 'STOP',
+        0x17: 'RLA',
+        0x18: 'JR r8',
+        0x1f: 'RRA',
+        0x22: 'LD (HL+),A',
+        0x27: 'DAA',
+        0x2a: 'LD A,(HL+)',
+        0x2f: 'CPL',
+        0x32: 'LD (HL-),A',
+        0x37: 'SCF',
+        0x3a: 'LD A,(HL-)',
+        0x3f: 'CCF',
+        0x76: 'HALT',
+        0xc3: 'JP a16',
+        0xc9: 'RET',
+        0xcb: 'PREFIX CB',
+        0xcd: 'CALL a16',
+        0xd9: 'RETI',
+        0xe0: 'LDH (a8),A',
+        0xe2: 'LD (C),A',
+        0xe8: 'ADD SP,r8',
+        0xe9: 'JP (HL)',
+        0xea: 'LD (a16),A',
+        0xf0: 'LDH A,(a8)',
+        0xf2: 'LD A,(C)',
+        0xf3: 'DI',
+        0xf8: 'LD HL,SP+r8',
+        0xf9: 'LD SP,HL',
+        0xfa: 'LD A,(a16)',
+        0xfb: 'EI',
+    }
+
+    cond_names = ['NZ', 'Z', 'NC', 'C']
+    alu_names = ['ADD A,', 'ADC A,', 'SUB ', 'SBC A,', 'AND ', 'XOR ', 'OR ', 'CP ']
+    cb_names = ['RLC', 'RRC', 'RL', 'RR', 'SLA', 'SRA', 'SWAP', 'SRL']
+
     registers = ['B', 'C', 'D', 'E', 'H', 'L', '(HL)', 'A', 'd8', 'r8', 'a16',
                  'BC', 'DE', 'HL', 'SP', 'AF', 'C', 'a8', 'r8', 'a16', 'd16', '(BC)', '(DE)']
 
-    conds = [
-        lambda self: not self.cpu.flag_Z(),
-        lambda self: self.cpu.flag_Z(),
-        lambda self: not self.cpu.flag_C(),
-        lambda self: self.cpu.flag_C()
-    ]
+    # conditions of JR, JP, CALL and RET as source
+    conds = ['not self.cpu.flag_Z()', 'self.cpu.flag_Z()', 'not self.cpu.flag_C()', 'self.cpu.flag_C()']
 
     def build(self, gameboy):
         self.cpu = gameboy.cpu
         self.mmu = gameboy.mmu
-        self.build_ops()
-        self.build_cb()
+
+        # the ops get the gameboy passed, the tables are shared by all instances
+        self.opcodes, self.cb = load_tables()
 
     def decode(self, inst, cb):
         if cb:
@@ -80,29 +124,40 @@ class Instructions:
         return self.opcodes[inst]
 
     def build_ops(self):
+        """
+        Source of all opcodes, an op is a single statement with self as the gameboy and value as the immediate operand.
+        Immediate operands are named d8, d16, a8, a16 and r8 in the mnemonics.
+        :return: opcode -> (len, cycles, source, mnemonic)
+        """
+
+        ops = {}
+        for i, (length, cycles, fun) in self.opcodes.items():
+            source = '{}(self{})'.format(fun.__name__, ', value' if length > 1 else '')
+            ops[i] = length, cycles, source, self.names.get(i)
 
         # INC, DEC
         for i in range(0x40):
             if i % 8 == 0 and i // 16 > 1:
-                self.opcodes[i] = 2, 12, lambda self, value, cond=self.conds[i // 8 - 4]: JR(self, value, cond)
+                ops[i] = 2, 12, 'if {}: JR(self, value)'.format(self.conds[i // 8 - 4]), \
+                    'JR {},r8'.format(self.cond_names[i // 8 - 4])
             elif i % 16 == 1:
-                self.opcodes[i] = self.build_op(20, i // 16 + 11, LD)
+                ops[i] = self.build_op(20, i // 16 + 11, 'LD(self, {})', 'LD {dst},{src}')
             elif i % 16 == 2 and i // 16 < 2:
-                self.opcodes[i] = self.build_op(7, i // 16 + 21, LD)
+                ops[i] = self.build_op(7, i // 16 + 21, 'LD(self, {})', 'LD {dst},{src}')
             elif i % 16 == 3:
-                self.opcodes[i] = self.build_op(i // 16 + 11, i // 16 + 11, INC_nn)
+                ops[i] = self.build_op(i // 16 + 11, i // 16 + 11, 'INC_nn(self, {})', 'INC {dst}')
             elif i % 16 == 9:
-                self.opcodes[i] = self.build_op(i // 16 + 11, 13, lambda self, x: ADD_HL_n(self, self.cpu.HL(), x))
+                ops[i] = self.build_op(i // 16 + 11, 13, 'ADD_HL_n(self, self.cpu.HL(), {})', 'ADD HL,{src}')
             elif i % 16 == 10 and i // 16 < 2:
-                self.opcodes[i] = self.build_op(i // 16 + 21, 7, LD)
+                ops[i] = self.build_op(i // 16 + 21, 7, 'LD(self, {})', 'LD {dst},{src}')
             elif i % 16 == 11:
-                self.opcodes[i] = self.build_op(i // 16 + 11, i // 16 + 11, DEC_nn)
+                ops[i] = self.build_op(i // 16 + 11, i // 16 + 11, 'DEC_nn(self, {})', 'DEC {dst}')
             elif i % 8 == 4:
-                self.opcodes[i] = self.build_op(i // 8, i // 8, INC)
+                ops[i] = self.build_op(i // 8, i // 8, 'INC(self, {})', 'INC {dst}')
             elif i % 8 == 5:
-                self.opcodes[i] = self.build_op(i // 8, i // 8, DEC)
+                ops[i] = self.build_op(i // 8, i // 8, 'DEC(self, {})', 'DEC {dst}')
             elif i % 8 == 6:
-                self.opcodes[i] = self.build_op(8, i // 8, LD)
+                ops[i] = self.build_op(8, i // 8, 'LD(self, {})', 'LD {dst},{src}')
 
         # LD
         for i in range(0x40, 0x80):
@@ -110,90 +165,202 @@ class Instructions:
                 # HALT
                 continue
 
-            self.opcodes[i] = self.build_op(i % 8, (i - 0x40) // 8, LD)
+            ops[i] = self.build_op(i % 8, (i - 0x40) // 8, 'LD(self, {})', 'LD {dst},{src}')
 
-        ops = [ADD, ADC, SUB, SBC, AND, XOR, OR, CP]
+        alu = ['ADD', 'ADC', 'SUB', 'SBC', 'AND', 'XOR', 'OR', 'CP']
         for i in range(0x80, 0xC0):
-            self.opcodes[i] = self.build_op(i % 8, 7, lambda self, x, fun=ops[(i - 0x80) // 8]: fun(self, self.cpu.A, x))
+            ops[i] = self.build_op(i % 8, 7, alu[(i - 0x80) // 8] + '(self, self.cpu.A, {})',
+                                   self.alu_names[(i - 0x80) // 8] + '{src}')
 
-        get_reg16 = [self.cpu.BC, self.cpu.DE, self.cpu.HL, self.cpu.AF]
-        set_reg16 = [self.cpu.set_BC, self.cpu.set_DE, self.cpu.set_HL, self.cpu.set_AF]
+        reg16 = ['BC', 'DE', 'HL', 'AF']
 
         for i in range(0xC0, 0x100):
+            cond = (i - 0xC0) // 8 % 4
 
             if i % 8 == 0 and (i - 0xC0) // 8 < 4:
-                self.opcodes[i] = 1, 12, lambda self, cond=self.conds[(i - 0xC0) // 8]: RET(self, cond)
+                ops[i] = 1, 12, 'if {}: RET(self)'.format(self.conds[cond]), 'RET {}'.format(self.cond_names[cond])
             elif i % 8 == 2 and (i - 0xC0) // 8 < 4:
-                self.opcodes[i] = 3, 12, lambda self, value, cond=self.conds[(i - 0xC0) // 8]: JP(self, value, cond)
+                ops[i] = 3, 12, 'if {}: JP(self, value)'.format(self.conds[cond]), \
+                    'JP {},a16'.format(self.cond_names[cond])
             elif i % 8 == 4 and (i - 0xC0) // 8 < 4:
-                self.opcodes[i] = 3, 12, lambda self, value, cond=self.conds[(i - 0xC0) // 8]: CALL(self, value, cond)
+                ops[i] = 3, 12, 'if {}: CALL(self, value)'.format(self.conds[cond]), \
+                    'CALL {},a16'.format(self.cond_names[cond])
             elif i % 16 == 1:
-                self.opcodes[i] = 1, 12, lambda self, fun=set_reg16[i // 16 - 12]: fun(POP(self))
+                ops[i] = 1, 12, 'self.cpu.set_{}(POP(self))'.format(reg16[i // 16 - 12]), \
+                    'POP {}'.format(reg16[i // 16 - 12])
             elif i % 16 == 5:
-                self.opcodes[i] = 1, 12, lambda self, fun=get_reg16[i // 16 - 12]: PUSH(self, fun())
+                ops[i] = 1, 12, 'PUSH(self, self.cpu.{}())'.format(reg16[i // 16 - 12]), \
+                    'PUSH {}'.format(reg16[i // 16 - 12])
             elif i % 8 == 6:
                 # XXX A,d8
-                self.opcodes[i] = self.build_op(8, 7, lambda self, x, fun=ops[((i - 0xC0) // 8)]: fun(self, self.cpu.A, x))
+                ops[i] = self.build_op(8, 7, alu[(i - 0xC0) // 8] + '(self, self.cpu.A, {})',
+                                       self.alu_names[(i - 0xC0) // 8] + '{src}')
             elif i % 8 == 7:
                 # RST XXX
-                self.opcodes[i] = 1, 16, lambda self, addr=(((i - 0xC0) // 7) - 1) * 8: RST(self, addr)
+                ops[i] = 1, 16, 'RST(self, {})'.format((((i - 0xC0) // 7) - 1) * 8), 'RST {:02X}H'.format(i - 0xC7)
+
+        return ops
 
     def build_cb(self):
-        ops = [RLC, RRC, RL, RR, SLA, SRA, SWAP, SRL, BIT, RES, SET]
+        """
+        :return: CB opcode -> (len, cycles, source, mnemonic)
+        """
+
+        ops = {}
         for i in range(0x40):
-            self.cb[i] = self.build_op(i % 8, i % 8, ops[i // 8])
+            ops[i] = self.build_op(i % 8, i % 8, self.cb_names[i // 8] + '(self, {})',
+                                   self.cb_names[i // 8] + ' {src}')
 
-        ops = [BIT, RES, SET]
+        bits = ['BIT', 'RES', 'SET']
         for i in range(0x40, 0x100):
-            self.cb[i] = self.build_op(i % 8, i % 8, lambda self, value, fun=ops[(i // 0x40) - 1], param=(i % 0x40) // 8: fun(self, value, param))
+            bit = bits[(i // 0x40) - 1]
+            ops[i] = self.build_op(i % 8, i % 8, '{}(self, {{}}, {})'.format(bit, (i % 0x40) // 8),
+                                   '{} {},{{src}}'.format(bit, (i % 0x40) // 8))
+
+        return ops
+
+    def build_source(self):
+        """
+        :return: Python source of a module defining the tables opcodes and cb
+        """
+
+        lines = ['# generated by instructions.instructions, do not edit', '',
+                 'from instructions.cb import *', 'from instructions.operations import *', '']
+        tables = []
+
+        for table, prefix, ops in (('opcodes', 'op', self.build_ops()), ('cb', 'cb', self.build_cb())):
+            entries = []
+            for i, (length, cycles, source, _) in sorted(ops.items()):
+                name = '{}_{:02X}'.format(prefix, i)
+                lines += ['', 'def {}(self{}):'.format(name, ', value' if length > 1 else ''), '    ' + source, '']
+                entries.append('    0x{:02X}: ({}, {}, {}),'.format(i, length, cycles, name))
+            tables += ['', '{} = {{'.format(table)] + entries + ['}']
+
+        return '\n'.join(lines + tables) + '\n'
+
+    def build_names(self):
+        """
+        Mnemonics of all opcodes, taken from build_ops and build_cb
+        :return: opcode -> mnemonic, CB opcode -> mnemonic
+        """
+
+        names = dict(self.names)
+        names.update((i, op[3]) for i, op in self.build_ops().items() if op[3])
+        cb = {i: op[3] for i, op in self.build_cb().items()}
+        return names, cb
+
+    def build_op(self, src, dst, template, name):
+        """
+        :param template: source of the operation with {} for the source operand
+        :param name: mnemonic with {src} and {dst} for the operands
+        :return: len, cycles, source, mnemonic
+        """
 
-    def build_op(self, src, dst, fun):
         src = self.registers[src]
         dst = self.registers[dst]
-        src_fun = self.getter_fun(src)
-        dst_fun = self.setter_fun(dst)
 
         if '8' in src:
-            return 2, 8, lambda self, value: dst_fun(self, fun(self, value))
-        elif '8' in dst:
-            return 2, 8, lambda self, value: dst_fun(self, value, fun(self, src_fun(self)))
+            length, cycles = 2, 8
         elif '16' in src:
-            return 3, 12, lambda self, value: dst_fun(self, fun(self, value))
-        elif '16' in dst:
-            return 3, 12, lambda self, value: dst_fun(self, value, fun(self, src_fun(self)))
-
-        return 1, 4, lambda self: dst_fun(self, fun(self, src_fun(self)))
-
-    def getter_fun(self, src):
-        mem = src.startswith('(') and src.endswith(')')
-        if mem:
-            src = src[1:-1]
-
-        if not hasattr(self.cpu, src):
-            if not mem:
-                return lambda self, value: value
-            else:
-                return lambda self, value: self.mmu.read(value)
-
-        fun = getattr(self.cpu, src)
-        if not isinstance(fun, types.MethodType):
-            fun = lambda self: getattr(self.cpu, src)
+            length, cycles = 3, 12
         else:
-            fun = lambda self: getattr(self.cpu, src)()
+            length, cycles = 1, 4
 
-        if mem:
-            return lambda self: self.mmu.read(fun(self))
-        else:
-            return fun
+        return length, cycles, self.setter(dst, template.format(self.getter(src))), name.format(src=src, dst=dst)
+
+    def getter(self, src):
+        """
+        :return: source reading a register, register pair, memory or the immediate operand
+        """
+
+        from gameboy.cpu import CPU
+
+        if src.startswith('(') and src.endswith(')'):
+            return 'self.mmu.read({})'.format(self.getter(src[1:-1]))
+
+        if not hasattr(CPU, src):
+            return 'value'
+
+        if callable(getattr(CPU, src)):
+            return 'self.cpu.{}()'.format(src)
+
+        return 'self.cpu.{}'.format(src)
+
+    def setter(self, dst, value):
+        """
+        :return: source writing value to a register, register pair or memory
+        """
+
+        from gameboy.cpu import CPU
 
-    def setter_fun(self, dst):
         if dst.startswith('(') and dst.endswith(')'):
-            fun = self.getter_fun(dst[1:-1])
-            return lambda self, value: self.mmu.write(fun(self), value)
+            return 'self.mmu.write({}, {})'.format(self.getter(dst[1:-1]), value)
 
-        attr = getattr(self.cpu, dst)
-        if not isinstance(attr, types.MethodType):
-            return lambda self, value: setattr(self.cpu, dst, value)
-        else:
-            dst = 'set_' + dst
-            return lambda self, value: getattr(self.cpu, dst)(value)
+        if callable(getattr(CPU, dst)):
+            return 'self.cpu.set_{}({})'.format(dst, value)
+
+        return 'self.cpu.{} = {}'.format(dst, value)
+
+
+def source_hash():
+    """
+    :return: hash of the sources the tables are generated from
+    """
+
+    digest = hashlib.sha1()
+    for name in (__name__, 'instructions.operations', 'instructions.cb', 'gameboy.cpu'):
+        with open(importlib.import_module(name).__file__, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+tables = None
+
+
+def load_tables():
+    """
+    Generate the opcode tables once and cache them compiled in __pycache__, keyed by the hash of the sources, so later
+    starts only unmarshal the code. The generated source is kept next to it for tracebacks.
+    :return: opcodes, cb
+    """
+
+    global tables
+    if tables:
+        return tables
+
+    directory = os.path.join(os.path.dirname(__file__), '__pycache__')
+    name = os.path.join(directory, 'optable_{}'.format(source_hash()))
+    path = '{}.{}.bin'.format(name, sys.implementation.cache_tag)
+
+    try:
+        with open(path, 'rb') as file:
+            code = marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        source = Instructions().build_source()
+        code = compile(source, name + '.py', 'exec')
+        try:
+            os.makedirs(directory, exist_ok=True)
+            # tables of other interpreters sharing the directory are kept, along with the sources they were built from
+            entries = [entry for entry in os.listdir(directory) if entry.startswith('optable_')]
+            tag = '.{}.bin'.format(sys.implementation.cache_tag)
+            for entry in entries:
+                if entry.endswith(tag):
+                    os.remove(os.path.join(directory, entry))
+            kept = {entry.split('.')[0] for entry in entries if entry.endswith('.bin') and not entry.endswith(tag)}
+            for entry in entries:
+                if entry.endswith('.py') and entry[:-3] not in kept:
+                    os.remove(os.path.join(directory, entry))
+            with open(name + '.py', 'w') as file:
+                file.write(source)
+            with open(path + '.tmp', 'wb') as file:
+                marshal.dump(code, file)
+            os.replace(path + '.tmp', path)
+        except OSError:
+            # read-only installation, use the code compiled in memory
+            pass
+
+    module = types.ModuleType('instructions.optable')
+    exec(code, module.__dict__)
+
+    tables = module.opcodes, module.cb
+    return tables
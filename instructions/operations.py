@@ -31,8 +31,7 @@ def HALT(self):
          Power down CPU until an interrupt occurs. Use this
          when ever possible to reduce energy consumption.
     """
-    # logging.warning("HALT called")
-    pass
+    self.cpu.halted = True
 
 
 def PUSH(self, value):